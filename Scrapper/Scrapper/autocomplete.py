@@ -0,0 +1,45 @@
+import time
+
+from Scrapper.utils import load_json_file, save_json_file
+
+def normalize_term(term):
+  if not term:
+    return ""
+  return " ".join(str(term).lower().split())
+
+class AutocompleteCache:
+  """Persistent cache of parsed autocomplete suggestions keyed by site and normalized keyword."""
+
+  def __init__(self, path, ttl_hours=24.0):
+    self.path = path
+    self.ttl_seconds = float(ttl_hours) * 3600
+    self.entries = load_json_file(path, default={}) or {}
+    self.dirty = False
+
+  def _key(self, site_key, keyword):
+    return f"{site_key}|{normalize_term(keyword)}"
+
+  def get(self, site_key, keyword):
+    """Returns the cached suggestion list, or None when missing or expired."""
+    entry = self.entries.get(self._key(site_key, keyword))
+    if not entry:
+      return None
+    if self.ttl_seconds > 0 and time.time() - entry.get('fetched_at', 0) > self.ttl_seconds:
+      return None
+    return entry.get('suggestions', [])
+
+  def put(self, site_key, keyword, suggestions):
+    self.entries[self._key(site_key, keyword)] = {
+      'fetched_at': time.time(),
+      'suggestions': suggestions
+    }
+    self.dirty = True
+
+  def save(self):
+    if not self.dirty:
+      return
+    if self.ttl_seconds > 0: # Drop expired entries so the file doesn't grow forever
+      cutoff = time.time() - self.ttl_seconds
+      self.entries = {k: v for k, v in self.entries.items() if v.get('fetched_at', 0) >= cutoff}
+    save_json_file(self.path, self.entries)
+    self.dirty = False
@@ -0,0 +1,474 @@
+import os
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from selenium import webdriver
+from selenium.webdriver.firefox.service import Service as FirefoxService
+from selenium.webdriver.firefox.options import Options as FirefoxOptions
+from selenium.webdriver.firefox.firefox_profile import FirefoxProfile
+from selenium.common.exceptions import WebDriverException, InvalidSessionIdException
+
+from Scrapper.utils import load_json_file, save_json_file, is_bot_challenge
+
+try:
+  import psutil # Optional: only needed for memory-based session recycling
+except ImportError:
+  psutil = None
+
+
+class DriverProvisioner:
+  """Resolves geckodriver and builds the Firefox profile/options once per process.
+
+  The resolved geckodriver path is cached on disk, so later runs never hit the
+  network (webdriver_manager is only used as a last resort, when allowed)."""
+
+  def __init__(self, config, cache_path, user_agent, logger):
+    self.config = config
+    self.cache_path = cache_path
+    self.user_agent = user_agent
+    self.logger = logger
+    self._geckodriver_path = None
+    self._profile = None
+    self._lock = threading.Lock()
+
+  def _is_executable(self, path):
+    return bool(path) and os.path.isfile(path) and os.access(path, os.X_OK)
+
+  def geckodriver_path(self):
+    with self._lock:
+      if self._geckodriver_path:
+        return self._geckodriver_path
+
+      # Pinned paths first: explicit config, then environment, then the on-disk cache, then PATH
+      candidates = [
+        ('config', self.config.get('geckodriver_path')),
+        ('env', os.environ.get('GECKODRIVER_PATH')),
+        ('cache', (load_json_file(self.cache_path, default={}) or {}).get('geckodriver_path')),
+        ('PATH', shutil.which('geckodriver')),
+      ]
+      for source, path in candidates:
+        if self._is_executable(path):
+          self.logger.info(f"Using geckodriver from {source}: {path}")
+          self._geckodriver_path = path
+          break
+
+      if not self._geckodriver_path:
+        if not self.config.get('allow_driver_download', True):
+          raise RuntimeError("No local geckodriver found and 'allow_driver_download' is disabled. Set 'geckodriver_path' in scraper_config.json.")
+        self.logger.info("No local geckodriver found, resolving it with GeckoDriverManager (network lookup)...")
+        os.environ['WDM_LOG_LEVEL'] = '0'
+        os.environ['WDM_PRINT_FIRST_LINE'] = 'False'
+        from webdriver_manager.firefox import GeckoDriverManager # Only imported when we actually need to download
+        self._geckodriver_path = GeckoDriverManager().install()
+        self.logger.info(f"GeckoDriver installed/found at: {self._geckodriver_path}")
+
+      try:
+        save_json_file(self.cache_path, {'geckodriver_path': self._geckodriver_path, 'resolved_at': time.time()})
+      except OSError as e:
+        self.logger.warning(f"Could not write driver cache {self.cache_path}: {e}")
+      return self._geckodriver_path
+
+  def profile(self):
+    with self._lock:
+      if self._profile is not None:
+        return self._profile
+
+      # A pinned profile directory is used as a template; otherwise start from an empty one
+      profile_dir = self.config.get('firefox_profile_dir')
+      if profile_dir and os.path.isdir(profile_dir):
+        self.logger.info(f"Using pinned Firefox profile template: {profile_dir}")
+        profile = FirefoxProfile(profile_dir)
+      else:
+        profile = FirefoxProfile()
+      # --- Enhanced Stealth Attempts for Firefox ---
+      # General privacy and anti-fingerprinting
+      profile.set_preference("dom.webdriver.enabled", False)
+      profile.set_preference('useAutomationExtension', False)
+      profile.set_preference("general.useragent.override", self.user_agent)
+      profile.set_preference("browser.privatebrowsing.autostart", True)
+      profile.set_preference("privacy.trackingprotection.enabled", True)
+      profile.set_preference("privacy.trackingprotection.pbmode.enabled", True)
+      profile.set_preference("privacy.resistFingerprinting", self.config.get("selenium_resist_fingerprinting", False)) # Can break sites
+      profile.set_preference("extensions.screenshots.disabled", True) # Minor, but less for site to query
+      profile.set_preference("media.peerconnection.enabled", False) # Disable WebRTC
+      profile.set_preference("geo.enabled", False) # Disable geolocation unless needed
+      self._profile = profile
+      return self._profile
+
+  def build_options(self, circuit=None):
+    options = FirefoxOptions()
+
+    if self.config.get('headless', False): # Default headless to False for easier debugging of bot pages
+      options.add_argument('--headless')
+      self.logger.info("Selenium Firefox configured to run in headless mode.")
+    else:
+      self.logger.info("Selenium Firefox configured to run with a visible browser window.")
+
+    options.profile = self.profile()
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument(f'--window-size={self.config.get("selenium_window_width", 1920)},{self.config.get("selenium_window_height", 1080)}')
+
+    if circuit is not None: # See Scrapper.proxies.CircuitPool (also covers the legacy use_tor/tor_socks_port)
+      socks_host, socks_port = circuit.socks
+      options.set_preference('network.proxy.type', 1)
+      options.set_preference('network.proxy.socks', socks_host)
+      options.set_preference('network.proxy.socks_port', socks_port)
+      options.set_preference('network.proxy.socks_version', 5)
+      options.set_preference("network.proxy.socks_remote_dns", True)
+      options.set_preference("network.proxy.allow_hijacking_localhost", True) # Local stand-ins/mock sites go through the proxy too
+      self.logger.info(f"Selenium Firefox configured to use SOCKS proxy {circuit.name} on {socks_host}:{socks_port}.")
+    else:
+      self.logger.info("Selenium Firefox will NOT use Tor proxy.")
+    return options
+
+  def launch(self, circuit=None):
+    """Starts a new Firefox instance, routed through circuit if given. Raises on failure."""
+    service = FirefoxService(executable_path=self.geckodriver_path())
+    driver = webdriver.Firefox(service=service, options=self.build_options(circuit))
+
+    # Try to further hide webdriver flag after driver initialization
+    driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    driver.execute_script("Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']})")
+    driver.execute_script("Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]})") # Fake some plugins
+    return driver
+
+
+class LazyBrowser:
+  """Launches the browser in a background thread on first demand.
+
+  start() returns immediately; get() blocks until the driver is up and returns
+  None if the launch failed (the error is logged once)."""
+
+  def __init__(self, provisioner, logger, on_launch=None, circuit=None):
+    self.provisioner = provisioner
+    self.logger = logger
+    self.on_launch = on_launch # Called with the new driver in the launch thread (e.g. session warm-up)
+    self.circuit = circuit
+    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='browser-launch')
+    self._future = None
+    self._lock = threading.Lock()
+
+  def _launch(self):
+    started = time.time()
+    self.logger.info("Launching Selenium Firefox WebDriver in the background...")
+    driver = self.provisioner.launch(self.circuit)
+    self.logger.info(f"Selenium Firefox WebDriver initialized successfully in {time.time() - started:.1f}s.")
+    if self.on_launch:
+      try:
+        self.on_launch(driver)
+      except Exception as e:
+        self.logger.warning(f"Browser warm-up failed: {e}")
+    return driver
+
+  def start(self):
+    with self._lock:
+      if self._future is None:
+        self._future = self._executor.submit(self._launch)
+    return self
+
+  def get(self, timeout=None):
+    self.start()
+    try:
+      return self._future.result(timeout=timeout)
+    except Exception as e:
+      if not getattr(self, '_error_logged', False):
+        self._error_logged = True
+        self.logger.error(f"CRITICAL: Failed to initialize Selenium WebDriver: {e}")
+        self.logger.error("Check Firefox/GeckoDriver compatibility, 'geckodriver_path', or if display is needed (if not headless). If using Tor, ensure it is running.")
+      return None
+
+  def failed(self):
+    """True once the launch has finished with an error."""
+    return self._future is not None and self._future.done() and self._future.exception() is not None
+
+  def current(self):
+    """Returns the driver only if it has already finished launching (never blocks)."""
+    if self._future is None or not self._future.done() or self._future.exception() is not None:
+      return None
+    return self._future.result()
+
+  def quit(self):
+    if self._future is None:
+      self._executor.shutdown(wait=False)
+      return
+    driver = self.get() # Waits for an in-flight launch so we never leak a Firefox process
+    self._executor.shutdown(wait=False)
+    if driver:
+      driver.quit()
+
+
+class BrowserSessionLost(WebDriverException):
+  """The browser or geckodriver is gone; the session has to be recycled."""
+
+
+class BrowserSession:
+  """A recyclable browser session.
+
+  Tracks pages served, consecutive bot challenges and the RSS of the
+  geckodriver/Firefox process tree, and transparently replaces the browser
+  with a fresh (warmed-up) instance before the next navigation once any of
+  the configured thresholds is crossed. A threshold of 0 disables that check.
+  A browser that died is replaced and the navigation retried once; a failed
+  launch is retried on the next navigation (or relaunch_interval seconds later)."""
+
+  def __init__(self, provisioner, logger, max_pages=0, max_rss_mb=0, max_bot_challenges=0,
+               rss_check_every=10, warm_up=None, circuit_pool=None, relaunch_interval=30):
+    self.provisioner = provisioner
+    self.logger = logger
+    self.circuit_pool = circuit_pool # Each browser instance is bound to one proxy circuit for its lifetime
+    self.max_pages = max_pages
+    self.max_rss_mb = max_rss_mb
+    self.max_bot_challenges = max_bot_challenges
+    self.rss_check_every = max(1, rss_check_every)
+    self.warm_up = warm_up
+    self.relaunch_interval = relaunch_interval
+
+    self.pages_served = 0
+    self.total_pages_served = 0
+    self._pages_since_rss_check = 0 # Tab batches add several pages at once, so a modulo on pages_served can skip checks
+    self.consecutive_challenges = 0
+    self.recycle_count = 0
+    self.peak_rss_mb = 0.0
+    self._recycle_reason = None
+    self._recycle_rotates_circuit = False # True when the recycle should also get its circuit a new exit
+    self._tabs = [] # Window handles of the current browser, the original one first
+    self._tabs_driver = None
+    self.circuit = circuit_pool.acquire() if circuit_pool else None
+    self._browser = LazyBrowser(provisioner, logger, on_launch=warm_up, circuit=self.circuit)
+    self._launched_at = time.time()
+
+    if max_rss_mb and psutil is None:
+      self.logger.warning("psutil is not installed; memory-based browser recycling is disabled.")
+
+  def start(self):
+    self._browser.start()
+    return self
+
+  @property
+  def driver(self):
+    driver = self._browser.get()
+    if driver is None and self._relaunch_if_failed():
+      driver = self._browser.get()
+    return driver
+
+  def _relaunch_if_failed(self, force=False):
+    """Replaces a browser whose launch failed; without force, at most once per relaunch_interval."""
+    if not self._browser.failed() or (not force and time.time() - self._launched_at < self.relaunch_interval):
+      return False
+    self.recycle("browser launch failed")
+    return True
+
+  def _live_driver(self):
+    self._relaunch_if_failed(force=True)
+    driver = self.driver
+    if driver is None:
+      raise WebDriverException("Selenium WebDriver is not available.")
+    return driver
+
+  def _session_lost(self, driver, error):
+    """Whether error means the browser itself is gone, rather than one page failing."""
+    if isinstance(error, InvalidSessionIdException):
+      return True
+    try:
+      driver.current_window_handle
+      return False
+    except Exception:
+      return True
+
+  def current(self):
+    return self._browser.current()
+
+  def rss_mb(self):
+    """Resident memory of geckodriver plus every Firefox process it spawned, in MB."""
+    driver = self._browser.current()
+    if psutil is None or driver is None:
+      return None
+    try:
+      root = psutil.Process(driver.service.process.pid)
+      procs = [root] + root.children(recursive=True)
+      total = 0
+      for proc in procs:
+        try:
+          total += proc.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+          pass
+      return total / (1024 * 1024)
+    except Exception:
+      return None
+
+  def record_page_result(self, was_bot_challenge):
+    if self.circuit_pool:
+      self.circuit_pool.report(self.circuit, challenge=was_bot_challenge)
+    if was_bot_challenge:
+      self.consecutive_challenges += 1
+      if self.max_bot_challenges and self.consecutive_challenges >= self.max_bot_challenges:
+        self._recycle_reason = f"{self.consecutive_challenges} consecutive bot challenges"
+        self._recycle_rotates_circuit = True
+      elif self.circuit_pool:
+        if self.circuit_pool.rotate(self.circuit):
+          # NEWNYM only applies to new streams: the browser's open keep-alive/HTTP2 connections would keep
+          # the challenged exit, so a browser started before the rotation is replaced as well
+          if self.circuit.last_rotated >= self._launched_at:
+            self._recycle_reason = f"circuit {self.circuit.name} rotated"
+        elif len(self.circuit_pool.circuits) > 1:
+          # No control port to get a new identity in place: move this session to another circuit
+          # (rotate() has already put this one on cooldown)
+          self._recycle_reason = f"circuit {self.circuit.name} challenged"
+    else:
+      self.consecutive_challenges = 0
+
+  def _check_thresholds(self):
+    if self._recycle_reason:
+      return
+    if self.max_pages and self.pages_served >= self.max_pages:
+      self._recycle_reason = f"served {self.pages_served} pages"
+    elif self.max_rss_mb and self._pages_since_rss_check >= self.rss_check_every:
+      self._pages_since_rss_check = 0
+      rss = self.rss_mb()
+      if rss is not None:
+        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+        if rss >= self.max_rss_mb:
+          self._recycle_reason = f"RSS {rss:.0f}MB >= {self.max_rss_mb}MB"
+
+  def recycle(self, reason, rotate_circuit=False):
+    self.logger.info(f"Recycling browser session #{self.recycle_count + 1} ({reason}).")
+    old_browser = self._browser
+    try:
+      old_browser.quit()
+    except Exception as e:
+      self.logger.warning(f"Error quitting old browser during recycle: {e}")
+    self.recycle_count += 1
+    self.pages_served = 0
+    self._pages_since_rss_check = 0
+    self.consecutive_challenges = 0
+    self._recycle_reason = None
+    self._recycle_rotates_circuit = False
+    if self.circuit_pool:
+      if rotate_circuit:
+        self.circuit_pool.rotate(self.circuit)
+      self.circuit_pool.release(self.circuit)
+      self.circuit = self.circuit_pool.acquire()
+    self._browser = LazyBrowser(self.provisioner, self.logger, on_launch=self.warm_up, circuit=self.circuit).start()
+    self._launched_at = time.time()
+
+  def get(self, url):
+    """Navigates to url, recycling the browser first if a threshold was crossed."""
+    self._check_thresholds()
+    if self._recycle_reason:
+      self.recycle(self._recycle_reason, rotate_circuit=self._recycle_rotates_circuit)
+    driver = self._live_driver()
+    try:
+      driver.get(url)
+    except Exception as e:
+      if not self._session_lost(driver, e):
+        raise
+      self.logger.warning(f"Browser session lost while loading {url} ({e}); recycling and retrying once.")
+      self.recycle("browser session lost")
+      driver = self._live_driver()
+      driver.get(url)
+    self.pages_served += 1
+    self._pages_since_rss_check += 1
+    self.total_pages_served += 1
+    return driver
+
+  def _tab_handles(self, driver, count):
+    """The browser's first `count` window handles, opening tabs as needed (reset when the browser is recycled)."""
+    if self._tabs_driver is not driver:
+      self._tabs = [driver.current_window_handle]
+      self._tabs_driver = driver
+    while len(self._tabs) < count:
+      driver.switch_to.new_window('tab')
+      self._tabs.append(driver.current_window_handle)
+    return self._tabs[:count]
+
+  def load_in_tabs(self, urls, tabs, ready_selector, timeout=30, poll_interval=0.25, dispatch_delay=None):
+    """Loads urls across up to `tabs` tabs of this browser and yields each page as soon as it is ready.
+
+    Navigations are started with window.location (which returns immediately) so
+    network waits overlap; every busy tab is then polled for readiness (document
+    parsed and ready_selector present, or load complete) and bot-checked. Yields
+    dicts with url, current_url, title, page_source, bot_challenge, timed_out,
+    error and elapsed; the driver is switched to that page's tab while the
+    consumer handles it, and back to the first tab when done. If the browser
+    dies, it is recycled and the pages not yielded yet are loaded once more."""
+    self._check_thresholds()
+    if self._recycle_reason:
+      self.recycle(self._recycle_reason, rotate_circuit=self._recycle_rotates_circuit)
+    remaining = list(urls)
+    try:
+      for page in self._load_in_tabs(self._live_driver(), remaining, tabs, ready_selector, timeout, poll_interval, dispatch_delay):
+        remaining.remove(page['url'])
+        yield page
+    except BrowserSessionLost as e:
+      self.logger.warning(f"Browser session lost during a tab batch ({e}); recycling and retrying {len(remaining)} pages once.")
+      self.recycle("browser session lost")
+      yield from self._load_in_tabs(self._live_driver(), remaining, tabs, ready_selector, timeout, poll_interval, dispatch_delay)
+
+  def _load_in_tabs(self, driver, urls, tabs, ready_selector, timeout, poll_interval, dispatch_delay):
+    handles = self._tab_handles(driver, max(1, min(tabs, len(urls))))
+    pending = list(urls)
+    free = list(handles)
+    busy = {} # handle -> (url, started)
+    try:
+      while pending or busy:
+        while pending and free:
+          handle, url = free.pop(0), pending.pop(0)
+          if dispatch_delay:
+            time.sleep(dispatch_delay())
+          try:
+            driver.switch_to.window(handle)
+            # The marker lives on the old document's window, so its absence means the new page has replaced it
+            driver.execute_script("window.__tabPending = true; window.location.href = arguments[0];", url)
+            busy[handle] = (url, time.time())
+          except Exception as e:
+            if self._session_lost(driver, e):
+              raise BrowserSessionLost(str(e)) from e
+            free.append(handle)
+            yield {'url': url, 'error': str(e), 'bot_challenge': False, 'timed_out': False, 'elapsed': 0.0}
+        if not busy:
+          continue
+        harvested = False
+        for handle, (url, started) in list(busy.items()):
+          elapsed = time.time() - started
+          try:
+            driver.switch_to.window(handle)
+            state = driver.execute_script(
+              "return [!!window.__tabPending, document.readyState, !!document.querySelector(arguments[0])];", ready_selector)
+          except Exception as e:
+            if self._session_lost(driver, e):
+              raise BrowserSessionLost(str(e)) from e
+            state = None # Mid-navigation; try again on the next poll
+          ready = state is not None and not state[0] and (state[1] == 'complete' or (state[1] == 'interactive' and state[2]))
+          if not ready and elapsed < timeout:
+            continue
+          del busy[handle]
+          free.append(handle)
+          harvested = True
+          result = {'url': url, 'elapsed': elapsed, 'timed_out': not ready, 'error': None, 'bot_challenge': False}
+          if ready:
+            try:
+              result.update(current_url=driver.current_url, title=driver.title, page_source=driver.page_source)
+            except WebDriverException as e:
+              result['error'] = str(e)
+          if result.get('page_source') is not None:
+            result['bot_challenge'] = is_bot_challenge(result['title'], result['current_url'], result['page_source'])
+            self.record_page_result(result['bot_challenge'])
+            self.pages_served += 1
+            self._pages_since_rss_check += 1
+            self.total_pages_served += 1
+          yield result
+        if not harvested:
+          time.sleep(poll_interval)
+    finally:
+      try:
+        driver.switch_to.window(handles[0])
+      except Exception:
+        pass # A dead browser is handled by the caller
+
+  def quit(self):
+    self._browser.quit()
+    if self.circuit_pool:
+      self.circuit_pool.release(self.circuit)
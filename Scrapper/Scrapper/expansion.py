@@ -0,0 +1,262 @@
+"""Bounded breadth-first keyword expansion over a site's autocomplete endpoint.
+
+Starting from each seed keyword (and the seed plus every configured suffix, e.g.
+"macbook pro a" .. "macbook pro z"), suggestions are looked up level by level;
+every new, category-allowed suggestion becomes a search term and, below
+expansion_max_depth, a query for the next level. Lookups are memoized in their
+own cache (expansion_cache.json, kept apart from the spider's shorter-lived
+autocomplete cache), are issued in small concurrent batches and stop at the term
+and lookup budgets, so a few thousand long-tail terms can be collected unattended:
+
+  python -m Scrapper.expansion --seeds "MacBook Pro" --max-terms 3000
+
+The result is written to <state_dir>/expanded_keywords.json, which the spider
+uses instead of the single-level suggestions when use_expanded_keywords is set.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import urllib.request
+from urllib.parse import quote_plus
+from concurrent.futures import ThreadPoolExecutor
+
+from Scrapper.autocomplete import AutocompleteCache, normalize_term
+from Scrapper.proxies import CircuitPool
+from Scrapper.utils import load_json_file, save_json_file, resolve_state_path, category_allowed
+
+DEFAULT_SUFFIXES = [f" {c}" for c in "abcdefghijklmnopqrstuvwxyz0123456789"]
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:126.0) Gecko/20100101 Firefox/126.0'
+
+
+def parse_autosug_json(payload):
+  """Parses an eBay autosug response ({"prefix", "res": {"sug": [...], "categories": [...]}}) into suggestion dicts."""
+  if isinstance(payload, (str, bytes)):
+    payload = json.loads(payload)
+  res = (payload or {}).get('res') or {}
+  categories = {}
+  for entry in res.get('categories') or []:
+    if isinstance(entry, dict) and entry.get('term'):
+      categories.setdefault(normalize_term(entry['term']), (entry.get('id'), entry.get('name')))
+  suggestions = []
+  for term in res.get('sug') or []:
+    cat_id, cat_name = categories.pop(normalize_term(term), (None, None))
+    suggestions.append({'search_term': term.strip(), 'category_name': cat_name, 'category_id': str(cat_id) if cat_id else None})
+  # Category-scoped suggestions that aren't in the plain list
+  for term, (cat_id, cat_name) in categories.items():
+    suggestions.append({'search_term': term, 'category_name': cat_name, 'category_id': str(cat_id) if cat_id else None})
+  return suggestions
+
+AUTOCOMPLETE_API_PARSERS = {
+  'ebay_autosug_json': parse_autosug_json,
+}
+
+
+class HttpAutocompleteLookup:
+  """Fetches and parses one keyword's suggestions from a site's autocomplete API. None on failure."""
+
+  def __init__(self, url_template, parser_type='ebay_autosug_json', timeout=10, user_agent=None, proxy_url=None, logger=None):
+    if parser_type not in AUTOCOMPLETE_API_PARSERS:
+      raise ValueError(f"Unsupported autocomplete API parser type: {parser_type}")
+    self.url_template = url_template
+    self.parse = AUTOCOMPLETE_API_PARSERS[parser_type]
+    self.timeout = timeout
+    self.user_agent = user_agent or DEFAULT_USER_AGENT
+    self.logger = logger or logging.getLogger(__name__)
+    handlers = [urllib.request.ProxyHandler({'http': proxy_url, 'https': proxy_url})] if proxy_url else []
+    self.opener = urllib.request.build_opener(*handlers)
+
+  def __call__(self, keyword):
+    url = self.url_template.replace('{keyword}', quote_plus(keyword))
+    request = urllib.request.Request(url, headers={'User-Agent': self.user_agent, 'Accept': 'application/json'})
+    try:
+      with self.opener.open(request, timeout=self.timeout) as response:
+        return self.parse(response.read().decode('utf-8', errors='replace'))
+    except (OSError, ValueError) as e:
+      self.logger.warning(f"Autocomplete lookup failed for '{keyword}': {e}")
+      return None
+
+
+class KeywordExpander:
+  """Breadth-first expansion of seed keywords through autocomplete lookups.
+
+  lookup(keyword) returns a suggestion list (search_term/category_name/category_id
+  dicts) or None on failure; results are memoized in the expansion cache."""
+
+  def __init__(self, lookup, cache, site_key, logger, allowed_category_keywords=None, allow_uncategorized=True,
+               suffixes=None, max_depth=2, max_terms=2000, max_lookups=5000, batch_size=8, lookup_delay=0.5):
+    self.lookup = lookup
+    self.cache = cache
+    self.site_key = site_key
+    self.logger = logger
+    self.allowed_category_keywords = allowed_category_keywords or []
+    self.allow_uncategorized = allow_uncategorized
+    self.suffixes = DEFAULT_SUFFIXES if suffixes is None else suffixes
+    self.max_depth = max_depth
+    self.max_terms = max_terms
+    self.max_lookups = max_lookups
+    self.batch_size = max(1, batch_size)
+    self.lookup_delay = lookup_delay # Pause between network batches
+    self.lookups = 0
+    self.cache_hits = 0
+    self.failures = 0
+    self.pruned = 0
+
+  def _suggestions_for(self, queries, executor):
+    """Cached results for the batch, plus concurrent lookups for the rest (within the lookup budget)."""
+    results, missing = {}, []
+    for query in queries:
+      cached = self.cache.get(self.site_key, query)
+      if cached is not None:
+        self.cache_hits += 1
+        results[query] = cached
+      elif self.lookups < self.max_lookups:
+        self.lookups += 1
+        missing.append(query)
+    if missing:
+      for query, suggestions in zip(missing, executor.map(self.lookup, missing)):
+        if suggestions is None:
+          self.failures += 1
+          continue
+        self.cache.put(self.site_key, query, suggestions)
+        results[query] = suggestions
+      if self.lookup_delay:
+        time.sleep(self.lookup_delay)
+    return results
+
+  def expand(self, seed):
+    """Returns the discovered search terms for one seed, in discovery (breadth-first) order."""
+    seed_norm = normalize_term(seed)
+    queried = set()
+    terms = {}
+    frontier = [seed_norm] + [normalize_term(seed_norm + suffix) for suffix in self.suffixes]
+    depth = 0
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=self.batch_size, thread_name_prefix='autocomplete') as executor:
+      while frontier and not exhausted and depth <= self.max_depth and len(terms) < self.max_terms:
+        next_frontier = []
+        level = [q for q in dict.fromkeys(frontier) if q not in queried]
+        for start in range(0, len(level), self.batch_size):
+          if len(terms) >= self.max_terms:
+            break
+          batch = level[start:start + self.batch_size]
+          queried.update(batch)
+          results = self._suggestions_for(batch, executor)
+          if not results and self.lookups >= self.max_lookups:
+            self.logger.info(f"Keyword expansion: lookup budget ({self.max_lookups}) exhausted.")
+            exhausted = True
+            break
+          for query in batch:
+            if len(terms) >= self.max_terms:
+              break
+            for suggestion in results.get(query, []):
+              term = normalize_term(suggestion.get('search_term'))
+              if not term or term in terms:
+                continue
+              if not category_allowed(suggestion, self.allowed_category_keywords, self.allow_uncategorized):
+                self.pruned += 1
+                continue
+              terms[term] = {
+                'search_term': suggestion['search_term'],
+                'category_name': suggestion.get('category_name'),
+                'category_id': suggestion.get('category_id'),
+                'depth': depth,
+                'parent': query,
+              }
+              if term not in queried:
+                next_frontier.append(term)
+              if len(terms) >= self.max_terms:
+                break
+        self.logger.info(f"Keyword expansion '{seed}': depth {depth} done, {len(terms)} terms, {self.lookups} lookups, "
+                         f"{self.cache_hits} cache hits, {self.pruned} pruned.")
+        frontier = next_frontier
+        depth += 1
+    return list(terms.values())
+
+
+def load_expanded_keywords(path, site_key, seed):
+  """The stored expansion of one seed keyword, or None."""
+  stored = load_json_file(path, default={}) or {}
+  entry = stored.get(site_key, {}).get(normalize_term(seed))
+  return entry.get('terms') if entry else None
+
+
+def save_expanded_keywords(path, site_key, expansions):
+  stored = load_json_file(path, default={}) or {}
+  site_entries = stored.setdefault(site_key, {})
+  for seed, terms in expansions.items():
+    site_entries[normalize_term(seed)] = {'expanded_at': time.time(), 'seed': seed, 'terms': terms}
+  save_json_file(path, stored)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Expand seed keywords into long-tail search terms via autocomplete.")
+  parser.add_argument('--config', default=None, help="scraper_config.json (default: the project's)")
+  parser.add_argument('--site', default='ebay_us')
+  parser.add_argument('--seeds', nargs='+', help="Seed keywords (default: base_keywords from the config)")
+  parser.add_argument('--max-depth', type=int)
+  parser.add_argument('--max-terms', type=int)
+  parser.add_argument('--max-lookups', type=int)
+  parser.add_argument('--log-level', default='INFO')
+  args = parser.parse_args(argv)
+
+  logging.basicConfig(level=args.log_level, format='%(asctime)s %(levelname)s %(message)s')
+  logger = logging.getLogger('keyword_expansion')
+  config_path = args.config or os.path.join(os.path.dirname(__file__), 'scraper_config.json')
+  config = load_json_file(config_path, default=None)
+  if not config:
+    logger.error(f"Could not load config from {config_path}.")
+    return 1
+  site_config = config.get('sites', {}).get(args.site)
+  if not site_config or not site_config.get('autocomplete_api_url_template'):
+    logger.error(f"Site '{args.site}' has no autocomplete_api_url_template configured.")
+    return 1
+
+  proxy_url = None
+  circuit_pool = CircuitPool.from_config(config, logger)
+  circuit = circuit_pool.acquire(require_http_tunnel=True) if circuit_pool else None
+  if circuit:
+    proxy_url = circuit.proxy_url
+  elif circuit_pool:
+    logger.warning("No proxy circuit has an http_tunnel; autocomplete lookups go out directly.")
+
+  # Not the spider's autocomplete_cache.json: its saves prune with the spider's (shorter) TTL
+  cache = AutocompleteCache(
+    resolve_state_path(config, config_path, 'expansion_cache.json'),
+    ttl_hours=config.get('expansion_cache_ttl_hours', config.get('autocomplete_cache_ttl_hours', 24))
+  )
+  expander = KeywordExpander(
+    HttpAutocompleteLookup(site_config['autocomplete_api_url_template'],
+                           site_config.get('autocomplete_api_parser_type', 'ebay_autosug_json'),
+                           proxy_url=proxy_url, logger=logger),
+    cache, args.site, logger,
+    allowed_category_keywords=site_config.get('allowed_category_keywords', []),
+    allow_uncategorized=site_config.get('allow_search_without_category_if_suggestion_had_no_category', False),
+    suffixes=config.get('expansion_suffixes'),
+    max_depth=args.max_depth if args.max_depth is not None else config.get('expansion_max_depth', 2),
+    max_terms=args.max_terms or config.get('expansion_max_terms', 2000),
+    max_lookups=args.max_lookups or config.get('expansion_max_lookups', 5000),
+    batch_size=config.get('expansion_batch_size', 8),
+    lookup_delay=config.get('expansion_lookup_delay_seconds', 0.5),
+  )
+  expansions = {}
+  try:
+    for seed in args.seeds or config.get('base_keywords', []):
+      expansions[seed] = expander.expand(seed)
+      cache.save() # Progress survives an interrupted overnight run
+  finally:
+    cache.save()
+    if circuit_pool:
+      circuit_pool.release(circuit)
+  output_path = resolve_state_path(config, config_path, 'expanded_keywords.json')
+  save_expanded_keywords(output_path, args.site, expansions)
+  for seed, terms in expansions.items():
+    logger.info(f"'{seed}': {len(terms)} search terms.")
+  logger.info(f"Wrote {output_path} ({expander.lookups} lookups, {expander.cache_hits} cache hits, {expander.failures} failures).")
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -12,6 +12,9 @@ class ScrapperItem(Item):
     condition = Field()
     brand = Field()
     location = Field()   # Item location
+    item_id = Field()    # eBay listing ID parsed from the item URL
+    shipping = Field()   # Shipping text from the search result card, e.g. "Free shipping"
+    thumbnail = Field()  # Search result card image URL
     # Refurbished = Field() # Can be part of condition or a specific tag
     free_returns = Field()
     
@@ -22,6 +25,7 @@ class ScrapperItem(Item):
     seller_link = Field()
     seller_verified = Field() # Less common directly, might be inferred
     top_rated_seller = Field() # Boolean or text
+    seller_id = Field() # Stable seller reference (see Scrapper.sellers); the full block can be exported separately
 
     # Meta Search Info
     derived_from_keyword = Field()
@@ -7,6 +7,9 @@ from scrapy import signals
 
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
+from scrapy.http import TextResponse
+
+from Scrapper.utils import is_bot_challenge
 
 
 class ScrapperSpiderMiddleware:
@@ -98,3 +101,73 @@ class ScrapperDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class CircuitProxyMiddleware:
+    """Binds each plain HTTP request to a circuit from the spider's CircuitPool.
+
+    Scrapy can't speak SOCKS, so requests go through the circuit's HTTP tunnel
+    port (Tor's HTTPTunnelPort). A challenged response is reported against its
+    circuit, the circuit is rotated and the request is retried on another one."""
+
+    def __init__(self, max_retries=1):
+        self.max_retries = max_retries
+        self._warned_no_tunnel = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.getint('CIRCUIT_CHALLENGE_RETRIES', 1))
+
+    def _circuit_for(self, request, spider):
+        pool = getattr(spider, 'circuit_pool', None)
+        name = request.meta.get('circuit')
+        if pool is None or not name:
+            return pool, None
+        return pool, pool.get(name)
+
+    def process_request(self, request, spider):
+        pool = getattr(spider, 'circuit_pool', None)
+        if pool is None or 'proxy' in request.meta:
+            return None
+        circuit = pool.acquire(require_http_tunnel=True)
+        if circuit is None:
+            if not self._warned_no_tunnel:
+                self._warned_no_tunnel = True
+                spider.logger.warning("No proxy circuit has an 'http_tunnel' endpoint; plain HTTP requests are NOT proxied.")
+            return None
+        request.meta['proxy'] = circuit.proxy_url
+        request.meta['circuit'] = circuit.name
+        return None
+
+    def process_response(self, request, response, spider):
+        pool, circuit = self._circuit_for(request, spider)
+        if circuit is None:
+            return response
+        pool.release(circuit)
+        if isinstance(response, TextResponse):
+            challenged = is_bot_challenge(response.css('title::text').get(), response.url, response.text)
+        else:
+            challenged = False
+        challenged = challenged or response.status in (403, 429)
+        pool.report(circuit, ok=response.status < 500, challenge=challenged)
+        if not challenged:
+            return response
+
+        pool.rotate(circuit)
+        retries = request.meta.get('circuit_retries', 0)
+        if retries >= self.max_retries:
+            spider.logger.warning(f"Bot challenge on {request.url} via {circuit.name}; giving up after {retries} circuit retries.")
+            return response
+        retry = request.replace(dont_filter=True)
+        retry.meta.pop('proxy', None)
+        retry.meta.pop('circuit', None)
+        retry.meta['circuit_retries'] = retries + 1
+        spider.logger.info(f"Bot challenge on {request.url} via {circuit.name}; retrying on another circuit.")
+        return retry
+
+    def process_exception(self, request, exception, spider):
+        pool, circuit = self._circuit_for(request, spider)
+        if circuit is not None:
+            pool.release(circuit)
+            pool.report(circuit, ok=False)
+        return None
@@ -7,7 +7,79 @@
 # useful for handling different item types with a single interface
 from itemadapter import ItemAdapter
 
+from Scrapper.sellers import SELLER_FIELDS
+from Scrapper.price_history import PriceHistoryStore, parse_price
+from Scrapper.utils import save_json_file, resolve_state_path
+
 
 class ScrapperPipeline:
     def process_item(self, item, spider):
         return item
+
+
+class SellerReferencePipeline:
+    """Replaces the per-row seller block with the `seller_id` reference.
+
+    Only active when `seller_export_mode` is "reference" in scraper_config.json;
+    the referenced sellers are written once to `sellers_export_path` instead."""
+
+    def open_spider(self, spider):
+        config = getattr(spider, 'config', {}) or {}
+        self.enabled = config.get('seller_export_mode', 'inline') == 'reference'
+        self.export_path = config.get('sellers_export_path', 'sellers.json')
+        self.seen_seller_ids = set()
+
+    def process_item(self, item, spider):
+        if not self.enabled:
+            return item
+        adapter = ItemAdapter(item)
+        seller_id = adapter.get('seller_id')
+        if seller_id:
+            self.seen_seller_ids.add(seller_id)
+            for field_name in SELLER_FIELDS:
+                adapter.pop(field_name, None)
+        return item
+
+    def close_spider(self, spider):
+        if not self.enabled or not self.seen_seller_ids:
+            return
+        registry = spider.seller_registry
+        sellers = {seller_id: registry.get(seller_id) for seller_id in sorted(self.seen_seller_ids)}
+        save_json_file(self.export_path, sellers)
+        spider.logger.info(f"Exported {len(sellers)} referenced sellers to {self.export_path}")
+
+
+class PriceHistoryPipeline:
+    """Appends a normalized (item ID, time, price, currency, condition, keyword) observation per item
+    to the price-history store, see price_history.py. Disabled by `price_history_enabled: false`."""
+
+    def open_spider(self, spider):
+        config = getattr(spider, 'config', {}) or {}
+        self.enabled = config.get('price_history_enabled', True)
+        self.store = None
+        self.appended = 0
+        if self.enabled:
+            path = config.get('price_history_path') or resolve_state_path(config, spider.config_path, 'price_history')
+            self.store = PriceHistoryStore(path)
+
+    def process_item(self, item, spider):
+        if not self.enabled:
+            return item
+        adapter = ItemAdapter(item)
+        item_id = adapter.get('item_id')
+        parsed = parse_price(adapter.get('price'))
+        if not item_id or not parsed:
+            spider.crawler.stats.inc_value('price_history/skipped')
+            return item
+        amount, currency = parsed
+        self.store.append(item_id, amount, currency=currency, condition=adapter.get('condition'),
+                          keyword=adapter.get('derived_from_keyword'))
+        self.appended += 1
+        return item
+
+    def close_spider(self, spider):
+        if not self.enabled:
+            return
+        rows = self.store.build_index() # Also flushes the buffered rows
+        self.store.close()
+        spider.logger.info(f"Price history: appended {self.appended} observations ({rows} total).")
@@ -0,0 +1,266 @@
+import time
+import statistics
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+from Scrapper.autocomplete import normalize_term
+from Scrapper.price_history import parse_price
+from Scrapper.utils import load_json_file, save_json_file
+
+# Tracking/display parameters that don't change which listings a search returns
+VOLATILE_QUERY_PARAMS = {'_from', 'rt', '_trksid', '_odkw', '_osacat', 'hash'}
+
+def canonicalize_srp_url(url):
+  """Normalizes a search URL so equivalent searches compare equal.
+
+  Lowercases scheme/host, drops tracking parameters, sorts the query and
+  normalizes the keyword (case, whitespace and word order don't change an
+  eBay keyword search)."""
+  parsed = urlparse(url)
+  params = []
+  for key, value in parse_qsl(parsed.query, keep_blank_values=True):
+    if key in VOLATILE_QUERY_PARAMS:
+      continue
+    if key == '_nkw':
+      value = " ".join(sorted(normalize_term(value).split()))
+    params.append((key, value))
+  params.sort()
+  return urlunparse((parsed.scheme.lower(), parsed.netloc.lower(), parsed.path.rstrip('/') or '/', '', urlencode(params), ''))
+
+
+class SeenItems:
+  """Item ID -> last time it was seen (epoch seconds), persisted between runs. The spider keeps
+  one for SRP listings and one for item page renders."""
+
+  def __init__(self, path, max_age_days=90):
+    self.path = path
+    self.max_age_seconds = max_age_days * 86400
+    self.items = load_json_file(path, default={}) or {}
+
+  def last_seen(self, item_id):
+    return self.items.get(item_id)
+
+  def mark(self, item_ids, when=None):
+    """Marks item IDs as seen; returns how many of them had never been seen before."""
+    when = when or time.time()
+    new_count = 0
+    for item_id in item_ids:
+      if item_id not in self.items:
+        new_count += 1
+      self.items[item_id] = when
+    return new_count
+
+  def save(self):
+    if self.max_age_seconds > 0:
+      cutoff = time.time() - self.max_age_seconds
+      self.items = {k: v for k, v in self.items.items() if v >= cutoff}
+    save_json_file(self.path, self.items)
+
+
+class QueryPlanner:
+  """Turns raw suggestion-derived searches into a deduplicated, ranked, budgeted plan.
+
+  Candidates are dicts with at least 'url', 'search_term', 'category_id' and
+  'meta'. Per-query yield (new item IDs per SRP render) is remembered across
+  runs and used to rank the next plan."""
+
+  def __init__(self, stats_path, logger, max_renders=0, pages_per_search=1,
+               subsume_max_extra_tokens=1, default_expected_yield=60.0, ema_alpha=0.5):
+    self.stats_path = stats_path
+    self.logger = logger
+    self.max_renders = max_renders # 0 = unlimited
+    self.pages_per_search = max(1, pages_per_search)
+    self.subsume_max_extra_tokens = subsume_max_extra_tokens
+    self.default_expected_yield = default_expected_yield
+    self.ema_alpha = ema_alpha
+    self.stats = load_json_file(stats_path, default={}) or {}
+    self.renders_used = 0
+
+  def _tokens(self, candidate):
+    return frozenset(normalize_term(candidate['search_term']).split())
+
+  def expected_yield(self, canonical_url, now=None):
+    now = now or time.time()
+    stats = self.stats.get(canonical_url)
+    if not stats:
+      return self.default_expected_yield # Unknown searches are explored optimistically
+    # A search re-run soon after the previous run mostly re-lists items we already have
+    hours_since = (now - stats.get('last_run', 0)) / 3600
+    recency = min(1.0, max(0.1, hours_since / 24))
+    return stats.get('ema_new_items', 0.0) * recency
+
+  def plan(self, candidates):
+    """Returns the candidates to run, best first, within the render budget."""
+    # 1. Exact duplicates after canonicalization (same term/category under different keywords)
+    unique = {}
+    for candidate in candidates:
+      candidate['canonical_url'] = canonicalize_srp_url(candidate['url'])
+      kept = unique.get(candidate['canonical_url'])
+      if kept:
+        kept.setdefault('merged_search_terms', []).append(candidate['search_term'])
+      else:
+        unique[candidate['canonical_url']] = candidate
+    deduped = list(unique.values())
+
+    # 2. Subsumption: within one category, "macbook pro 2019" already lists everything
+    # "macbook pro 2019 16" would (keyword search is an AND of words).
+    deduped.sort(key=lambda c: len(self._tokens(c)))
+    kept_candidates = []
+    for candidate in deduped:
+      tokens = self._tokens(candidate)
+      broader = None
+      if self.subsume_max_extra_tokens > 0:
+        for other in kept_candidates:
+          other_tokens = self._tokens(other)
+          if other['category_id'] == candidate['category_id'] and other_tokens < tokens \
+              and len(tokens - other_tokens) <= self.subsume_max_extra_tokens:
+            broader = other
+            break
+      if broader:
+        broader.setdefault('merged_search_terms', []).append(candidate['search_term'])
+        self.logger.debug(f"Planner: '{candidate['search_term']}' subsumed by '{broader['search_term']}' (category {candidate['category_id']}).")
+      else:
+        kept_candidates.append(candidate)
+
+    # 3. Rank by expected new-item yield
+    now = time.time()
+    for candidate in kept_candidates:
+      candidate['planner_score'] = self.expected_yield(candidate['canonical_url'], now)
+    kept_candidates.sort(key=lambda c: c['planner_score'], reverse=True)
+
+    # 4. Enforce the per-run browser budget
+    planned = kept_candidates
+    if self.max_renders:
+      max_searches = max(1, self.max_renders // self.pages_per_search)
+      planned = kept_candidates[:max_searches]
+      for skipped in kept_candidates[max_searches:]:
+        self.logger.debug(f"Planner: budget exhausted, skipping '{skipped['search_term']}' (score {skipped['planner_score']:.1f}).")
+
+    self.logger.info(f"Query planner: {len(candidates)} candidate searches -> {len(deduped)} unique -> "
+                     f"{len(kept_candidates)} after subsumption -> {len(planned)} planned"
+                     f"{f' (budget {self.max_renders} SRP renders)' if self.max_renders else ''}.")
+    return planned
+
+  def consume_render(self):
+    """Reserves one SRP render from the run budget; False once it is spent."""
+    if self.max_renders and self.renders_used >= self.max_renders:
+      return False
+    self.renders_used += 1
+    return True
+
+  def record_result(self, canonical_url, items_listed, new_items):
+    stats = self.stats.setdefault(canonical_url, {'runs': 0, 'ema_new_items': float(new_items)})
+    stats['ema_new_items'] = self.ema_alpha * new_items + (1 - self.ema_alpha) * stats.get('ema_new_items', 0.0)
+    stats['runs'] = stats.get('runs', 0) + 1
+    stats['last_items_listed'] = items_listed
+    stats['last_new_items'] = new_items
+    stats['last_run'] = time.time()
+
+  def save(self):
+    save_json_file(self.stats_path, self.stats)
+
+
+# Deferred item pages sort after every other request
+DEFERRED_PRIORITY_OFFSET = -10000
+
+class ItemScheduler:
+  """Scores item page requests from what is known at SRP time and enforces the item page budget.
+
+  score = keyword weight x (novelty and value, weighted), where novelty is 1 for an
+  item whose page was never rendered and grows with time since its last render otherwise,
+  and value compares the SRP price with the median price of its category (this run's
+  cards, or the keyword's recent price history until enough cards were seen).
+
+  Item pages are held until every planned SRP has been rendered, then released best
+  score first, so the budget goes to the best items across all searches."""
+
+  def __init__(self, logger, budget=0, keyword_weights=None, default_keyword_weight=1.0,
+               novelty_weight=0.6, value_weight=0.4, revisit_after_hours=168, defer_below=0.3,
+               reference_price=None, min_category_samples=10, max_priority=99):
+    self.logger = logger
+    self.budget = budget # Item page renders per run, 0 = unlimited
+    self.keyword_weights = {normalize_term(k): v for k, v in (keyword_weights or {}).items()}
+    self.default_keyword_weight = default_keyword_weight
+    self.novelty_weight = novelty_weight
+    self.value_weight = value_weight
+    self.revisit_after_seconds = max(1, revisit_after_hours) * 3600
+    self.defer_below = defer_below
+    self.reference_price = reference_price # keyword -> median price from history, or None
+    self.min_category_samples = min_category_samples
+    self.max_priority = max_priority # Stays below description_iframe_priority
+    self._category_prices = {}
+    self._reference_cache = {}
+    self._held = []
+    self.scheduled = 0
+    self.renders_used = 0
+    self.deferred = 0
+    self.dropped = 0
+
+  def observe_prices(self, card_items):
+    """Feeds an SRP page's card prices into the running per-category medians."""
+    for card in card_items:
+      parsed = parse_price(card.get('price'))
+      if parsed:
+        prices = self._category_prices.setdefault(card.get('category') or '', [])
+        if len(prices) < 1000:
+          prices.append(parsed[0])
+
+  def _median_price(self, card):
+    prices = self._category_prices.get(card.get('category') or '', [])
+    if len(prices) >= self.min_category_samples:
+      return statistics.median(prices)
+    keyword = card.get('derived_from_keyword')
+    if self.reference_price and keyword:
+      if keyword not in self._reference_cache:
+        self._reference_cache[keyword] = self.reference_price(keyword)
+      if self._reference_cache[keyword]:
+        return self._reference_cache[keyword]
+    return statistics.median(prices) if prices else None
+
+  def keyword_weight(self, card, search_term=None):
+    for term in (search_term, card.get('derived_from_keyword')):
+      weight = self.keyword_weights.get(normalize_term(term or ''))
+      if weight is not None:
+        return weight
+    return self.default_keyword_weight
+
+  def score(self, card, last_rendered=None, search_term=None, now=None):
+    now = now or time.time()
+    if last_rendered is None:
+      novelty = 1.0
+    else: # Re-visits are worth at most half a new listing
+      novelty = 0.5 * min(1.0, max(0.0, now - last_rendered) / self.revisit_after_seconds)
+    value = 0.5 # Unknown price or reference: neutral
+    parsed = parse_price(card.get('price'))
+    median = self._median_price(card)
+    if parsed and median:
+      value = min(1.0, parsed[0] / median / 2) # At the median -> 0.5, twice the median or more -> 1
+    return self.keyword_weight(card, search_term) * (self.novelty_weight * novelty + self.value_weight * value)
+
+  def admit(self, score):
+    """Request priority for an item page with this score, or None to drop it."""
+    if self.budget and (self.renders_used >= self.budget or self.scheduled >= self.budget):
+      self.dropped += 1
+      return None
+    priority = min(self.max_priority, int(round(score * 50)))
+    if score < self.defer_below:
+      self.deferred += 1
+      priority += DEFERRED_PRIORITY_OFFSET
+    self.scheduled += 1
+    return priority
+
+  def hold(self, score, entry):
+    """Keeps an item page back until release(), so it is ranked against the items of later searches."""
+    self._held.append((score, entry))
+
+  def release(self):
+    """Admits the held item pages best score first; returns (priority or None, score, entry) tuples."""
+    held, self._held = sorted(self._held, key=lambda held_entry: held_entry[0], reverse=True), []
+    return [(self.admit(score), score, entry) for score, entry in held]
+
+  def consume_render(self):
+    """Reserves one item page render from the run budget; False once it is spent."""
+    if self.budget and self.renders_used >= self.budget:
+      self.dropped += 1
+      return False
+    self.renders_used += 1
+    return True
@@ -0,0 +1,332 @@
+"""Append-only, columnar price-history store indexed by item ID and keyword.
+
+Layout of a store directory:
+  item_id.col, ts.col, price.col, currency.col, condition.col, keyword.col
+      one fixed-width column file per field, one row per observation (append-only)
+  dictionary.json
+      code -> string tables for the dictionary-encoded currency/condition/keyword columns
+  item.idx / item_rows.idx, keyword.idx / keyword_rows.idx
+      row numbers sorted by item ID (resp. keyword code); rows are appended in time
+      order, so within one item the rows stay sorted by time
+  index.json
+      number of rows covered by the indexes (newer rows are scanned linearly until reindex)
+
+Columns and indexes are memory-mapped at query time, so looking up one listing is a
+binary search plus a handful of reads regardless of how many observations exist.
+
+  python -m Scrapper.price_history history 123456789012 --days 30
+  python -m Scrapper.price_history distribution "MacBook Pro" --days 30
+"""
+import os
+import re
+import sys
+import json
+import mmap
+import time
+import array
+import bisect
+import argparse
+import statistics
+
+from Scrapper.utils import load_json_file, save_json_file, resolve_state_path
+
+# field -> array typecode
+COLUMNS = {
+  'item_id': 'Q',
+  'ts': 'I',
+  'price': 'd',
+  'currency': 'H',
+  'condition': 'H',
+  'keyword': 'H',
+}
+DICTIONARY_COLUMNS = ('currency', 'condition', 'keyword')
+NO_VALUE = 0 # Code 0 is reserved for "unknown" in every dictionary column
+
+CURRENCY_PREFIXES = [
+  ('US $', 'USD'), ('C $', 'CAD'), ('AU $', 'AUD'), ('HK $', 'HKD'), ('NZ $', 'NZD'),
+  ('GBP', 'GBP'), ('£', 'GBP'), ('EUR', 'EUR'), ('€', 'EUR'), ('USD', 'USD'), ('$', 'USD'),
+]
+
+def parse_price(text):
+  """'US $1,234.56' -> (1234.56, 'USD'). Ranges ('$100.00 to $200.00') keep the low end. None if no amount."""
+  if not text:
+    return None
+  text = str(text).strip()
+  currency = None
+  for prefix, code in CURRENCY_PREFIXES:
+    if prefix in text:
+      currency = code
+      break
+  match = re.search(r'\d[\d,]*(?:\.\d+)?', text)
+  if not match:
+    return None
+  return float(match.group(0).replace(',', '')), currency
+
+
+def _bisect_rows(rows, ts, lo, hi, value):
+  """First position in rows[lo:hi] whose timestamp is >= value."""
+  while lo < hi:
+    mid = (lo + hi) // 2
+    if ts[rows[mid]] < value:
+      lo = mid + 1
+    else:
+      hi = mid
+  return lo
+
+
+class _MappedColumn:
+  """Read-only typed view of a column/index file (empty files are handled without mmap)."""
+
+  def __init__(self, path, typecode):
+    self._file = self._map = None
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    itemsize = array.array(typecode).itemsize
+    usable = size - size % itemsize # Ignore a torn trailing write
+    if usable:
+      self._file = open(path, 'rb')
+      self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+      self.view = memoryview(self._map)[:usable].cast(typecode)
+    else:
+      self.view = array.array(typecode)
+
+  def __len__(self):
+    return len(self.view)
+
+  def close(self):
+    if isinstance(self.view, memoryview):
+      self.view.release()
+    if self._map is not None:
+      self._map.close()
+      self._file.close()
+
+
+class PriceHistoryStore:
+  def __init__(self, path, flush_every=500):
+    self.path = path
+    self.flush_every = flush_every
+    os.makedirs(path, exist_ok=True)
+    self.dictionary = load_json_file(self._file('dictionary.json'), default=None) or {name: [None] for name in DICTIONARY_COLUMNS}
+    self._codes = {name: {value: code for code, value in enumerate(values)} for name, values in self.dictionary.items()}
+    self._buffer = {name: array.array(typecode) for name, typecode in COLUMNS.items()}
+    self._readers = None
+
+  def _file(self, name):
+    return os.path.join(self.path, name)
+
+  def _column_path(self, name):
+    return self._file(f"{name}.col")
+
+  def _encode(self, column, value):
+    if value in (None, ""):
+      return NO_VALUE
+    value = " ".join(str(value).split())
+    key = value.lower() if column == 'keyword' else value
+    code = self._codes[column].get(key)
+    if code is None:
+      code = len(self.dictionary[column])
+      self.dictionary[column].append(key)
+      self._codes[column][key] = code
+    return code
+
+  # --- writing ---
+  def append(self, item_id, price, currency=None, condition=None, keyword=None, ts=None):
+    for name, value in (
+      ('item_id', int(item_id)),
+      ('ts', int(ts if ts is not None else time.time())),
+      ('price', float(price)),
+      ('currency', self._encode('currency', currency)),
+      ('condition', self._encode('condition', condition)),
+      ('keyword', self._encode('keyword', keyword)),
+    ):
+      self._buffer[name].append(value)
+    if len(self._buffer['item_id']) >= self.flush_every:
+      self.flush()
+
+  def flush(self):
+    if not len(self._buffer['item_id']):
+      return
+    self._close_readers()
+    # Dictionary first: a crash after it leaves unused codes, never rows pointing at missing codes
+    save_json_file(self._file('dictionary.json'), self.dictionary)
+    rows = len(self._buffer['item_id'])
+    for name, values in self._buffer.items():
+      with open(self._column_path(name), 'ab') as f:
+        values.tofile(f)
+    self._buffer = {name: array.array(typecode) for name, typecode in COLUMNS.items()}
+    return rows
+
+  def build_index(self):
+    """Rebuilds the item and keyword indexes over every stored row."""
+    self.flush()
+    self._close_readers()
+    item_ids = self._load_column('item_id')
+    keywords = self._load_column('keyword')
+    rows = len(item_ids)
+    # Stable sorts on the key alone keep rows of one item/keyword in append (= time) order
+    for key_column, values, typecode in (('item', item_ids, 'Q'), ('keyword', keywords, 'H')):
+      order = sorted(range(rows), key=values.__getitem__)
+      self._write_atomic(f"{key_column}.idx", array.array(typecode, (values[r] for r in order)))
+      self._write_atomic(f"{key_column}_rows.idx", array.array('I', order))
+    save_json_file(self._file('index.json'), {'indexed_rows': rows, 'built_at': time.time()})
+    return rows
+
+  def _load_column(self, name):
+    values = array.array(COLUMNS[name])
+    path = self._column_path(name)
+    if os.path.exists(path):
+      with open(path, 'rb') as f:
+        size = os.path.getsize(path)
+        values.fromfile(f, size // values.itemsize)
+    return values
+
+  def _write_atomic(self, name, values):
+    tmp_path = self._file(f".{name}.tmp")
+    with open(tmp_path, 'wb') as f:
+      values.tofile(f)
+    os.replace(tmp_path, self._file(name))
+
+  # --- reading ---
+  def _open_readers(self):
+    if self._readers is None:
+      readers = {name: _MappedColumn(self._column_path(name), typecode) for name, typecode in COLUMNS.items()}
+      for key_column, typecode in (('item', 'Q'), ('keyword', 'H')):
+        readers[f"{key_column}.idx"] = _MappedColumn(self._file(f"{key_column}.idx"), typecode)
+        readers[f"{key_column}_rows.idx"] = _MappedColumn(self._file(f"{key_column}_rows.idx"), 'I')
+      # Columns are written one after another, so a concurrent/crashed writer can leave them uneven
+      readers['rows'] = min(len(readers[name]) for name in COLUMNS)
+      index_meta = load_json_file(self._file('index.json'), default={}) or {}
+      readers['indexed_rows'] = min(index_meta.get('indexed_rows', 0), len(readers['item_rows.idx']), readers['rows'])
+      self._readers = readers
+    return self._readers
+
+  def _close_readers(self):
+    if self._readers is not None:
+      for value in self._readers.values():
+        if isinstance(value, _MappedColumn):
+          value.close()
+      self._readers = None
+
+  def close(self):
+    self.flush()
+    self._close_readers()
+
+  def _rows_for(self, key_column, value_column, key, since=None, until=None):
+    readers = self._open_readers()
+    keys, rows, ts = readers[f"{key_column}.idx"].view, readers[f"{key_column}_rows.idx"].view, readers['ts'].view
+    lo = bisect.bisect_left(keys, key)
+    hi = bisect.bisect_right(keys, key)
+    # Within one key the rows are in append order, i.e. by time, so the window is two more binary searches
+    if since is not None:
+      lo = _bisect_rows(rows, ts, lo, hi, since)
+    if until is not None:
+      hi = _bisect_rows(rows, ts, lo, hi, until + 1)
+    found = [rows[i] for i in range(lo, hi) if rows[i] < readers['rows']]
+    # Rows appended since the last reindex are scanned directly
+    column = readers[value_column].view
+    found.extend(r for r in range(readers['indexed_rows'], readers['rows'])
+                 if column[r] == key and (since is None or ts[r] >= since) and (until is None or ts[r] <= until))
+    return found
+
+  def _row(self, readers, row):
+    return {
+      'ts': readers['ts'].view[row],
+      'price': readers['price'].view[row],
+      'currency': self.dictionary['currency'][readers['currency'].view[row]],
+      'condition': self.dictionary['condition'][readers['condition'].view[row]],
+      'keyword': self.dictionary['keyword'][readers['keyword'].view[row]],
+      'item_id': str(readers['item_id'].view[row]),
+    }
+
+  def history(self, item_id, since=None, until=None):
+    """All observations of one listing, oldest first."""
+    self.flush()
+    readers = self._open_readers()
+    observations = [self._row(readers, row) for row in self._rows_for('item', 'item_id', int(item_id), since, until)]
+    observations.sort(key=lambda o: o['ts'])
+    return observations
+
+  def keyword_distribution(self, keyword, since=None, until=None, latest_per_item=True):
+    """Price distribution of a keyword's listings (by default one observation per listing: the latest)."""
+    self.flush()
+    code = self._codes['keyword'].get(" ".join(str(keyword).split()).lower())
+    if code is None:
+      return {'keyword': keyword, 'count': 0}
+    readers = self._open_readers()
+    ts_col, price_col, id_col, cur_col = readers['ts'].view, readers['price'].view, readers['item_id'].view, readers['currency'].view
+    latest = {}
+    prices = []
+    currencies = {}
+    for row in self._rows_for('keyword', 'keyword', code, since, until):
+      ts = ts_col[row]
+      if latest_per_item:
+        item_id = id_col[row]
+        if item_id not in latest or ts >= latest[item_id][0]:
+          latest[item_id] = (ts, row)
+      else:
+        prices.append(price_col[row])
+        currencies[cur_col[row]] = currencies.get(cur_col[row], 0) + 1
+    for ts, row in latest.values():
+      prices.append(price_col[row])
+      currencies[cur_col[row]] = currencies.get(cur_col[row], 0) + 1
+    if not prices:
+      return {'keyword': keyword, 'count': 0}
+    prices.sort()
+    # Inclusive quartiles stay within min..max for small samples
+    quartiles = statistics.quantiles(prices, n=4, method='inclusive') if len(prices) > 1 else [prices[0]] * 3
+    main_currency = max(currencies, key=currencies.get)
+    return {
+      'keyword': keyword,
+      'count': len(prices),
+      'currency': self.dictionary['currency'][main_currency],
+      'min': prices[0],
+      'p25': round(quartiles[0], 2),
+      'median': round(quartiles[1], 2),
+      'p75': round(quartiles[2], 2),
+      'max': prices[-1],
+      'mean': round(statistics.fmean(prices), 2),
+    }
+
+
+def default_store_path(config_path=None):
+  config_path = config_path or os.path.join(os.path.dirname(__file__), 'scraper_config.json')
+  config = load_json_file(config_path, default={}) or {}
+  return resolve_state_path(config, config_path, 'price_history')
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Query the price-history store.")
+  parser.add_argument('--store', help="Store directory (default: <state_dir>/price_history from scraper_config.json)")
+  parser.add_argument('--config', help="scraper_config.json used to locate the default store")
+  sub = parser.add_subparsers(dest='command', required=True)
+  history_parser = sub.add_parser('history', help="Price history of one listing")
+  history_parser.add_argument('item_id')
+  history_parser.add_argument('--days', type=float, help="Only the last N days")
+  dist_parser = sub.add_parser('distribution', help="Price distribution of a keyword's listings")
+  dist_parser.add_argument('keyword')
+  dist_parser.add_argument('--days', type=float, help="Only the last N days")
+  dist_parser.add_argument('--all-observations', action='store_true', help="Use every observation, not just the latest per listing")
+  sub.add_parser('reindex', help="Rebuild the item/keyword indexes")
+  args = parser.parse_args(argv)
+
+  store = PriceHistoryStore(args.store or default_store_path(args.config))
+  since = time.time() - args.days * 86400 if getattr(args, 'days', None) else None
+  started = time.perf_counter()
+  if args.command == 'history':
+    observations = store.history(args.item_id, since=since)
+    for obs in observations:
+      when = time.strftime('%Y-%m-%d %H:%M', time.localtime(obs['ts']))
+      print(f"{when}  {obs['price']:>10.2f} {obs['currency'] or ''}  {obs['condition'] or ''}")
+    print(f"{len(observations)} observations ({1000 * (time.perf_counter() - started):.1f} ms)", file=sys.stderr)
+  elif args.command == 'distribution':
+    result = store.keyword_distribution(args.keyword, since=since, latest_per_item=not args.all_observations)
+    print(json.dumps(result, indent=2))
+    print(f"({1000 * (time.perf_counter() - started):.1f} ms)", file=sys.stderr)
+  else:
+    rows = store.build_index()
+    print(f"Indexed {rows} observations.")
+  store.close()
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
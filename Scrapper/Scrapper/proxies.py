@@ -0,0 +1,191 @@
+import time
+import socket
+import threading
+
+
+def parse_endpoint(value, default_host='127.0.0.1'):
+  """'host:port', 'port' or an int -> (host, port); None stays None."""
+  if value in (None, ""):
+    return None
+  if isinstance(value, int):
+    return default_host, value
+  host, _, port = str(value).rpartition(':')
+  return (host or default_host), int(port)
+
+
+class Circuit:
+  """One SOCKS endpoint (a Tor instance/SocksPort, or any SOCKS5 proxy) plus its health counters.
+
+  http_tunnel is an optional HTTP CONNECT endpoint for the same exit (Tor's
+  HTTPTunnelPort) used by Scrapy's plain HTTP requests, which can't speak SOCKS."""
+
+  def __init__(self, name, socks, http_tunnel=None, control=None, control_password=None):
+    self.name = name
+    self.socks = socks
+    self.http_tunnel = http_tunnel
+    self.control = control
+    self.control_password = control_password
+    self.in_use = 0
+    self.requests = 0
+    self.failures = 0
+    self.challenges = 0
+    self.rotations = 0
+    self.cooldown_until = 0.0
+    self.last_rotated = 0.0
+
+  @property
+  def proxy_url(self):
+    return f"http://{self.http_tunnel[0]}:{self.http_tunnel[1]}" if self.http_tunnel else None
+
+  @property
+  def challenge_rate(self):
+    return self.challenges / self.requests if self.requests else 0.0
+
+  def is_cooling(self, now=None):
+    return (now or time.time()) < self.cooldown_until
+
+  def summary(self):
+    return {
+      'socks': f"{self.socks[0]}:{self.socks[1]}",
+      'requests': self.requests,
+      'failures': self.failures,
+      'challenges': self.challenges,
+      'challenge_rate': round(self.challenge_rate, 3),
+      'rotations': self.rotations,
+      'cooling': self.is_cooling(),
+    }
+
+
+class CircuitPool:
+  """Hands out circuits to browser sessions and HTTP requests and rotates challenged ones.
+
+  A challenged circuit gets a new Tor identity (SIGNAL NEWNYM on its control
+  port) when one is configured; otherwise it is put on cooldown so the next
+  acquire() picks a different exit. Circuits with a high challenge rate are
+  avoided as long as healthier ones exist."""
+
+  def __init__(self, circuits, logger, cooldown_seconds=300, max_challenge_rate=0.3, newnym_min_interval=10):
+    self.circuits = circuits
+    self.logger = logger
+    self.cooldown_seconds = cooldown_seconds
+    self.max_challenge_rate = max_challenge_rate
+    self.newnym_min_interval = newnym_min_interval # Tor rate-limits NEWNYM anyway
+    self._lock = threading.Lock()
+    self._next = 0
+
+  @classmethod
+  def from_config(cls, config, logger):
+    """Builds the pool from 'proxy_circuits', or a single circuit from the legacy use_tor/tor_socks_port. None if unproxied."""
+    entries = config.get('proxy_circuits') or []
+    if not entries and config.get('use_tor', False):
+      entries = [{'socks': config.get('tor_socks_port', 9150)}]
+    if not entries:
+      return None
+    circuits = []
+    for idx, entry in enumerate(entries):
+      if not isinstance(entry, dict):
+        entry = {'socks': entry}
+      circuits.append(Circuit(
+        entry.get('name') or f"circuit{idx}",
+        parse_endpoint(entry['socks']),
+        http_tunnel=parse_endpoint(entry.get('http_tunnel')),
+        control=parse_endpoint(entry.get('control')),
+        control_password=entry.get('control_password'),
+      ))
+    logger.info(f"Proxy circuit pool: {', '.join(f'{c.name}=socks://{c.socks[0]}:{c.socks[1]}' for c in circuits)}")
+    return cls(circuits, logger,
+               cooldown_seconds=config.get('circuit_cooldown_seconds', 300),
+               max_challenge_rate=config.get('circuit_max_challenge_rate', 0.3),
+               newnym_min_interval=config.get('circuit_newnym_min_interval_seconds', 10))
+
+  def get(self, name):
+    return next((c for c in self.circuits if c.name == name), None)
+
+  def acquire(self, require_http_tunnel=False):
+    """Least-loaded circuit that isn't cooling down or over the challenge-rate limit (round-robin on ties)."""
+    with self._lock:
+      candidates = [c for c in self.circuits if c.http_tunnel or not require_http_tunnel]
+      if not candidates:
+        return None
+      now = time.time()
+      healthy = [c for c in candidates if not c.is_cooling(now) and c.challenge_rate <= self.max_challenge_rate]
+      if not healthy:
+        healthy = [c for c in candidates if not c.is_cooling(now)] or [min(candidates, key=lambda c: c.cooldown_until)]
+      start = self._next % len(self.circuits)
+      self._next += 1
+      ordered = sorted(healthy, key=lambda c: (c.in_use, (self.circuits.index(c) - start) % len(self.circuits)))
+      circuit = ordered[0]
+      circuit.in_use += 1
+      return circuit
+
+  def release(self, circuit):
+    if circuit is None:
+      return
+    with self._lock:
+      circuit.in_use = max(0, circuit.in_use - 1)
+
+  def report(self, circuit, ok=True, challenge=False):
+    if circuit is None:
+      return
+    with self._lock:
+      circuit.requests += 1
+      if not ok:
+        circuit.failures += 1
+      if challenge:
+        circuit.challenges += 1
+
+  def rotate(self, circuit):
+    """Gets the circuit a fresh exit. Returns True if it did so in place (NEWNYM), False if it was put on cooldown."""
+    if circuit is None:
+      return False
+    now = time.time()
+    if circuit.control:
+      if now - circuit.last_rotated < self.newnym_min_interval:
+        return True # A rotation is already under way
+      try:
+        if self._send_newnym(circuit):
+          with self._lock:
+            circuit.rotations += 1
+            circuit.last_rotated = now
+            circuit.requests = circuit.challenges = circuit.failures = 0 # New identity, fresh health record
+          self.logger.info(f"Rotated circuit {circuit.name} (NEWNYM).")
+          return True
+        self.logger.warning(f"Tor control port for {circuit.name} rejected NEWNYM.")
+      except OSError as e:
+        self.logger.warning(f"Could not reach Tor control port for {circuit.name}: {e}")
+    with self._lock:
+      circuit.rotations += 1
+      circuit.last_rotated = now
+      circuit.cooldown_until = now + self.cooldown_seconds
+    self.logger.info(f"Circuit {circuit.name} cooling down for {self.cooldown_seconds}s.")
+    return False
+
+  def _send_newnym(self, circuit):
+    password = (circuit.control_password or "").replace('\\', '\\\\').replace('"', '\\"')
+    with socket.create_connection(circuit.control, timeout=5) as sock:
+      sock.sendall(f'AUTHENTICATE "{password}"\r\nSIGNAL NEWNYM\r\nQUIT\r\n'.encode())
+      reply = b""
+      while True:
+        chunk = sock.recv(1024)
+        if not chunk:
+          break
+        reply += chunk
+    lines = [line for line in reply.decode(errors='replace').splitlines() if line.strip()]
+    return bool(lines) and all(line.startswith('250') for line in lines)
+
+  def probe(self, timeout=3.0):
+    """TCP health check of every SOCKS endpoint; unreachable ones are put on cooldown."""
+    results = {}
+    for circuit in self.circuits:
+      try:
+        with socket.create_connection(circuit.socks, timeout=timeout):
+          results[circuit.name] = True
+      except OSError:
+        results[circuit.name] = False
+        with self._lock:
+          circuit.cooldown_until = time.time() + self.cooldown_seconds
+        self.logger.warning(f"Circuit {circuit.name} (socks://{circuit.socks[0]}:{circuit.socks[1]}) is unreachable.")
+    return results
+
+  def summary(self):
+    return {c.name: c.summary() for c in self.circuits}
@@ -0,0 +1,115 @@
+import time
+
+from Scrapper.utils import load_json_file, save_json_file
+
+# Pseudo-selector holding the per-field "did any selector match" counters
+FIELD_KEY = '__field__'
+
+class SelectorStats:
+  """Per-field selector hit/miss counters, persisted across runs.
+
+  Fallback chains are tried in order of historical hit rate, so the selector
+  that matches today's layout is evaluated first and the legacy ones are
+  usually never reached. At the end of a run, fields whose hit rate collapsed
+  compared to history are reported as layout drift."""
+
+  def __init__(self, path, logger, min_samples=20, drift_threshold=0.5, explore_every=50, decay=0.95):
+    self.path = path
+    self.logger = logger
+    self.min_samples = min_samples
+    self.drift_threshold = drift_threshold
+    self.explore_every = max(1, explore_every)
+    self.decay = decay # Older runs weigh less, so the ordering follows layout changes
+    stored = load_json_file(path, default={}) or {}
+    self.history = stored.get('fields', {})
+    self.run = {}
+    self._calls = {}
+
+  def _counter(self, table, field, selector):
+    return table.setdefault(field, {}).setdefault(selector, {'hits': 0, 'misses': 0})
+
+  def record(self, field, selector, hit):
+    counter = self._counter(self.run, field, selector)
+    counter['hits' if hit else 'misses'] += 1
+
+  def _score(self, field, selector):
+    # Laplace-smoothed hit rate over history + this run; untried selectors start at 0.5
+    hits = misses = 0
+    for table in (self.history, self.run):
+      counter = table.get(field, {}).get(selector)
+      if counter:
+        hits += counter['hits']
+        misses += counter['misses']
+    return (hits + 1) / (hits + misses + 2)
+
+  def ordered(self, field, selectors):
+    scored = [(-self._score(field, sel), idx, sel) for idx, sel in enumerate(selectors)]
+    return [sel for _, _, sel in sorted(scored)]
+
+  def first(self, field, selectors, extract):
+    """Returns the first non-empty extract(selector), trying the best selectors first."""
+    for selector in self.ordered(field, selectors):
+      value = extract(selector)
+      hit = bool(value and (not isinstance(value, str) or value.strip()))
+      self.record(field, selector, hit)
+      if hit:
+        self.record(field, FIELD_KEY, True)
+        return value
+    self.record(field, FIELD_KEY, False)
+    return None
+
+  def should_try(self, field, selector):
+    """For optional fallback branches: skip ones that have never matched, probing them now and then."""
+    self._calls[(field, selector)] = self._calls.get((field, selector), 0) + 1
+    hits = misses = 0
+    for table in (self.history, self.run):
+      counter = table.get(field, {}).get(selector)
+      if counter:
+        hits += counter['hits']
+        misses += counter['misses']
+    if hits > 0 or hits + misses < self.min_samples:
+      return True
+    return self._calls[(field, selector)] % self.explore_every == 0
+
+  def _rate(self, counter):
+    total = counter['hits'] + counter['misses']
+    return (counter['hits'] / total) if total else None
+
+  def drift_report(self):
+    """Fields whose hit rate this run fell below drift_threshold x their historical rate."""
+    report = []
+    for field, selectors in self.run.items():
+      run_counter = selectors.get(FIELD_KEY)
+      hist_counter = self.history.get(field, {}).get(FIELD_KEY)
+      if not run_counter or not hist_counter:
+        continue
+      run_total = run_counter['hits'] + run_counter['misses']
+      hist_total = hist_counter['hits'] + hist_counter['misses']
+      if run_total < self.min_samples or hist_total < self.min_samples:
+        continue
+      run_rate, hist_rate = self._rate(run_counter), self._rate(hist_counter)
+      if hist_rate and run_rate < hist_rate * self.drift_threshold:
+        matching = [s for s in selectors if s != FIELD_KEY and selectors[s]['hits'] > 0]
+        best = max(matching, key=lambda s: self._rate(selectors[s]), default=None)
+        report.append({
+          'field': field,
+          'run_hit_rate': round(run_rate, 3),
+          'historical_hit_rate': round(hist_rate, 3),
+          'samples': run_total,
+          'best_selector_this_run': best,
+        })
+    return report
+
+  def save(self):
+    # Fold this run into the decayed history
+    for field, selectors in self.history.items():
+      for counter in selectors.values():
+        counter['hits'] *= self.decay
+        counter['misses'] *= self.decay
+    for field, selectors in self.run.items():
+      for selector, counter in selectors.items():
+        hist = self._counter(self.history, field, selector)
+        hist['hits'] += counter['hits']
+        hist['misses'] += counter['misses']
+    save_json_file(self.path, {'updated_at': time.time(), 'fields': self.history})
+    self.run = {}
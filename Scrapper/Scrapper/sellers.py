@@ -0,0 +1,117 @@
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, unquote
+
+from Scrapper.utils import load_json_file, save_json_file
+
+# Item fields that describe the seller rather than the listing
+SELLER_FIELDS = ('seller_name', 'seller_rating', 'seller_feedback_count', 'seller_link', 'seller_verified', 'top_rated_seller')
+# The fields that change over time and need the fragile selector chains; their age decides freshness
+PROFILE_FIELDS = ('seller_rating', 'seller_feedback_count')
+
+def seller_id_for(seller_name=None, seller_link=None):
+  """Stable seller reference: the username from a /usr/ profile link, else the normalized display name.
+
+  Store links (/str/<store>) carry the store name, not the username the SRP card
+  shows, so they fall back to the name to keep one key per seller."""
+  if seller_link:
+    path = urlparse(seller_link).path
+    match = re.search(r'/usr/([^/?#]+)', path)
+    if match:
+      return unquote(match.group(1)).strip().lower()
+  if seller_name:
+    return " ".join(seller_name.lower().split())
+  return None
+
+class SellerRegistry:
+  """LRU/TTL cache of seller profiles keyed by seller ID, persisted between runs.
+
+  The TTL runs from the last time profile data was actually scraped (scraped_at)
+  or fetched from the profile page (enriched_at); serving an entry from the
+  cache does not extend it, so active sellers are re-scraped periodically."""
+
+  def __init__(self, path, max_entries=5000, ttl_hours=168.0):
+    self.path = path
+    self.max_entries = max_entries
+    self.ttl_seconds = float(ttl_hours) * 3600
+    stored = load_json_file(path, default={}) or {}
+    # JSON keeps insertion order, so the on-disk order doubles as the LRU order
+    self.entries = OrderedDict(stored)
+    self.pending_enrichment = set()
+    self.hits = 0
+    self.misses = 0
+
+  def _age_ok(self, timestamp):
+    return self.ttl_seconds <= 0 or time.time() - (timestamp or 0) <= self.ttl_seconds
+
+  def _enriched_at(self, entry):
+    # Entries written before enriched_at existed only carry the 'enriched' flag and 'updated_at'
+    return entry.get('enriched_at') or (entry.get('updated_at', 0) if entry.get('enriched') else 0)
+
+  def _is_fresh(self, entry):
+    return self._age_ok(max(entry.get('scraped_at') or entry.get('updated_at', 0), self._enriched_at(entry)))
+
+  def lookup(self, seller_id):
+    """Returns the cached seller fields, or None when missing or expired."""
+    entry = self.entries.get(seller_id) if seller_id else None
+    if not entry or not self._is_fresh(entry):
+      self.misses += 1
+      return None
+    self.entries.move_to_end(seller_id)
+    self.hits += 1
+    return entry['fields']
+
+  def is_complete(self, seller_id):
+    """True when a fresh entry already has the fields that need the fragile selector chains."""
+    entry = self.entries.get(seller_id) if seller_id else None
+    if not entry or not self._is_fresh(entry):
+      return False
+    return all(entry['fields'].get(f) is not None for f in ('seller_rating', 'seller_feedback_count'))
+
+  def update(self, seller_id, fields, enriched=False):
+    """Merges freshly scraped (or, with enriched=True, profile page) fields; only real profile data restarts the TTL."""
+    if not seller_id:
+      return
+    entry = self.entries.pop(seller_id, None) or {'fields': {}}
+    entry.pop('updated_at', None)
+    for key, value in fields.items():
+      if key in SELLER_FIELDS and value not in (None, ""):
+        entry['fields'][key] = value
+    if any(fields.get(f) not in (None, "") for f in PROFILE_FIELDS):
+      entry['enriched_at' if enriched else 'scraped_at'] = time.time()
+    elif enriched:
+      entry['enriched_at'] = time.time() # Profile fetched, even if it had nothing to add
+    entry.pop('enriched', None)
+    self.entries[seller_id] = entry
+    while self.max_entries and len(self.entries) > self.max_entries:
+      self.entries.popitem(last=False)
+
+  def resolve(self, fields):
+    """Merges freshly scraped seller fields with the cache. Returns (seller_id, merged_fields)."""
+    seller_id = seller_id_for(fields.get('seller_name'), fields.get('seller_link'))
+    if not seller_id:
+      return None, fields
+    merged = dict(self.lookup(seller_id) or {})
+    merged.update({k: v for k, v in fields.items() if v not in (None, "")})
+    self.update(seller_id, fields) # Only what was scraped now; cached values must not look fresh
+    return seller_id, {f: merged.get(f) for f in SELLER_FIELDS}
+
+  def needs_enrichment(self, seller_id):
+    """True the first time a not-yet-enriched seller is seen (one profile fetch per seller)."""
+    if not seller_id or seller_id in self.pending_enrichment:
+      return False
+    entry = self.entries.get(seller_id)
+    if entry and self._enriched_at(entry) and self._age_ok(self._enriched_at(entry)):
+      return False
+    self.pending_enrichment.add(seller_id)
+    return True
+
+  def get(self, seller_id):
+    entry = self.entries.get(seller_id)
+    return dict(entry['fields']) if entry else None
+
+  def save(self):
+    if self.ttl_seconds > 0:
+      self.entries = OrderedDict((k, v) for k, v in self.entries.items() if self._is_fresh(v))
+    save_json_file(self.path, self.entries)
@@ -10,6 +10,8 @@ ROBOTSTXT_OBEY = False # Be respectful of site terms
 ITEM_PIPELINES = {
   'scrapy.pipelines.images.ImagesPipeline': 1,
   # 'Scrapper.pipelines.ScrapperPipeline': 300, # If you add custom processing
+  'Scrapper.pipelines.PriceHistoryPipeline': 300, # Before SellerReferencePipeline trims the item
+  'Scrapper.pipelines.SellerReferencePipeline': 400, # No-op unless seller_export_mode is "reference"
 }
 
 # Configure ImagesPipeline
@@ -42,4 +44,9 @@ CONCURRENT_REQUESTS_PER_IP = 1 # If not using rotating IPs
 # DOWNLOADER_MIDDLEWARES = {
 #    'scrapy.downloadermiddlewares.useragent.UserAgentMiddleware': None, # Disable default
 #    'scrapy_user_agents.middlewares.RandomUserAgentMiddleware': 400, # Example
-# }
\ No newline at end of file
+# }
+# Binds plain HTTP requests to the proxy circuit pool (no-op unless proxy_circuits/use_tor is configured)
+DOWNLOADER_MIDDLEWARES = {
+   'Scrapper.middlewares.CircuitProxyMiddleware': 350, # Must run before HttpProxyMiddleware (750)
+}
+CIRCUIT_CHALLENGE_RETRIES = 1
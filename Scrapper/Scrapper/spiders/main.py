@@ -6,19 +6,25 @@ import time
 import re # For sanitizing filenames
 import random # For random delays
 
-# Selenium and WebDriver Manager
+# Selenium (driver provisioning and launch live in Scrapper.browser)
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.firefox.service import Service as FirefoxService
-from selenium.webdriver.firefox.options import Options as FirefoxOptions
-from selenium.webdriver.firefox.firefox_profile import FirefoxProfile # Correct import for profile
-from webdriver_manager.firefox import GeckoDriverManager
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 
 from bs4 import BeautifulSoup
 from Scrapper.items import ScrapperItem
+from Scrapper.browser import DriverProvisioner, BrowserSession
+from Scrapper.autocomplete import AutocompleteCache
+from Scrapper.expansion import load_expanded_keywords
+from Scrapper.sellers import SellerRegistry, SELLER_FIELDS, PROFILE_FIELDS, seller_id_for
+from Scrapper.planner import QueryPlanner, SeenItems, ItemScheduler
+from Scrapper.price_history import PriceHistoryStore
+from Scrapper.selector_stats import SelectorStats
+from Scrapper.proxies import CircuitPool
+from Scrapper.utils import resolve_state_path, extract_item_id, is_bot_challenge, category_allowed
+from scrapy.exceptions import DontCloseSpider
 from scrapy.http import HtmlResponse 
 
 # Helper function to sanitize filenames
@@ -42,8 +48,71 @@ def safe_get(element, method, *args, default=None):
   except AttributeError:
     return default
 
+# Fallback selector chains for item page fields. Order here is only the initial order:
+# SelectorStats re-orders each chain by historical hit rate (see Scrapper.selector_stats).
+TITLE_SELECTORS = [
+  'h1.x-item-title__mainTitle span.ux-textspans::text',
+  'h1#itemTitle span.ux-textspans--BOLD::text',
+  'h1#itemTitle ::text',
+]
+PRICE_SELECTORS = [
+  'div.x-price-primary span.ux-textspans::text',
+  'span#prcIsum::text',
+  'span#mm-saleDscPrc::text',
+  'div[data-testid="item-price"] span.ux-textspans::text',
+]
+DESCRIPTION_SELECTORS = [
+  'div#desc_module div#ds_div',
+  'div#desc_div',
+  'div#descriptioncontent',
+  'section#description ~ div[class*="vim"]',
+  'div#viTabs_0_is',
+]
+CONDITION_SELECTORS = [
+  'div[data-testid="x-item-condition"] div.ux-labels-values__values-content span.ux-textspans::text',
+  'div.d-item-condition span.ux-textspans::text',
+  "//div[contains(@class, 'ux-labels-values__labels') and (.//span[contains(translate(text(), 'CONDITION', 'condition'), 'condition')] or .//span[contains(translate(text(), 'Condition', 'condition'), 'Condition')])]/following-sibling::div[contains(@class, 'ux-labels-values__values')]//span/text()",
+]
+SELLER_NAME_SELECTORS = [
+  'div.x-sellercard-atf__info__about-seller a span.ux-textspans::text',
+  'span.ux-seller-section__ μέροςMark span.ux-textspans--PSEUDONYM::text',
+  'div.ux-seller-section__item--seller a span.ux-textspans::text',
+  'a[data-testid="seller-profile-link"] span span::text',
+  'div.ux-seller-section__item--seller span[class*="ux-textspans"]::text',
+]
+SELLER_LINK_SELECTORS = [
+  'div.x-sellercard-atf__info__about-seller a.ux-action[aria-label*="feedback score"]::attr(href)',
+  'a.ux-seller-section__action[aria-label*="feedback score"]::attr(href)',
+  'div.ux-seller-section__item--seller a::attr(href)',
+  'a[data-testid="seller-profile-link"]::attr(href)',
+]
+SELLER_FEEDBACK_SELECTORS = [
+  'div.x-sellercard-atf__info__about-seller a.ux-action[aria-label*="feedback score"] span[aria-hidden="true"]::text',
+  'span.ux-seller-section__item--feedbackscore span.ux-textspans::text',
+  'a[data-testid="seller-profile-link"] span.ux-textspans--SECONDARY::text',
+  'div.ux-seller-section__item--feedbackscore span[class*="ux-textspans"]::text',
+]
+SELLER_RATING_SELECTORS = [
+  'div.x-sellercard-atf__info__rating span.ux-textspans--PERCENTAGE',
+  'div.ux-seller-section__item--positive-feedback span.ux-textspans--SENTIMENT_POSITIVE::text',
+  'div[data-testid="seller-score"] span.ux-textspans--سجل::text',
+  'div.ux-seller-section__item--positivefeedback span[class*="ux-textspans"]::text',
+]
+SPECIFICS_TABLE_FALLBACK = 'div.itemAttr table tr, div.item-specifics table tr, table.vi-ia-tb tr'
+
+def select_text(response, selector, join=False):
+  """css/xpath (xpath when the selector starts with '/') -> first match, or all matches joined."""
+  is_xpath = selector.startswith('/')
+  selection = response.xpath(selector) if is_xpath else response.css(selector)
+  if not join:
+    return selection.get()
+  if is_xpath: # Multi-node xpath values (e.g. condition from the specifics list) are space separated
+    return " ".join(t.strip() for t in selection.getall() if t.strip()).strip()
+  return "".join(selection.getall()).strip()
+
 class MainSpider(scrapy.Spider):
   name = "main"
+  site_key = 'ebay_us'
   custom_settings = {
     'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Firefox/90.0', # Use the defined constant
     'ROBOTSTXT_OBEY': False,
@@ -57,116 +126,137 @@ class MainSpider(scrapy.Spider):
     'CONCURRENT_REQUESTS' : 1,
   }
 
-  def __init__(self, *args, **kwargs):
+  def __init__(self, *args, config_path=None, **kwargs):
     super(MainSpider, self).__init__(*args, **kwargs)
-    self.config_path = os.path.join(os.path.dirname(__file__), '..', 'scraper_config.json')
+    # `scrapy crawl main -a config_path=...` points a run (e.g. the load-test harness) at another config
+    self.config_path = config_path or os.path.join(os.path.dirname(__file__), '..', 'scraper_config.json')
     self.config = self._load_config()
     
     self.allowed_domains = self._get_allowed_domains()
     self.base_keywords_to_search = self.config.get('base_keywords', [])
     self.selenium_timeout = self.config.get('selenium_wait_timeout', 25) # Increased
     self.max_srp_pages = self.config.get("max_srp_pages_to_scrape_per_search", 1) # Keep low for testing
-
-    options = FirefoxOptions()
-    
-    if self.config.get('headless', False): # Default headless to False for easier debugging of bot pages
-      options.add_argument('--headless')
-      self.logger.info("Selenium Firefox configured to run in headless mode.")
-    else:
-      self.logger.info("Selenium Firefox configured to run with a visible browser window.")
-
-    # --- Enhanced Stealth Attempts for Firefox ---
-    profile = FirefoxProfile()
-    # General privacy and anti-fingerprinting
-    profile.set_preference("dom.webdriver.enabled", False)
-    profile.set_preference('useAutomationExtension', False)
-    profile.set_preference("general.useragent.override", self.custom_settings.get('USER_AGENT'))
-    profile.set_preference("browser.privatebrowsing.autostart", True)
-    profile.set_preference("privacy.trackingprotection.enabled", True)
-    profile.set_preference("privacy.trackingprotection.pbmode.enabled", True)
-    profile.set_preference("privacy.resistFingerprinting", self.config.get("selenium_resist_fingerprinting", False)) # Can break sites
-    profile.set_preference("extensions.screenshots.disabled", True) # Minor, but less for site to query
-    profile.set_preference("media.peerconnection.enabled", False) # Disable WebRTC
-    profile.set_preference("geo.enabled", False) # Disable geolocation unless needed
-
-    # Spoof screen resolution (adjust if needed, or make configurable)
-    # screen_width = self.config.get("selenium_screen_width", 1920)
-    # screen_height = self.config.get("selenium_screen_height", 1080)
-    # options.add_argument(f"--width={screen_width}")
-    # options.add_argument(f"--height={screen_height}")
-    # Note: Setting window size via options.add_argument('--window-size=W,H') is often more reliable.
-
-    options.profile = profile # This is the correct way for modern Selenium with FirefoxOptions
-    # ------
-
-    options.add_argument('--disable-gpu') 
-    options.add_argument('--no-sandbox') 
-    options.add_argument(f'--window-size={self.config.get("selenium_window_width", 1920)},{self.config.get("selenium_window_height", 1080)}')
-    
-    if self.config.get('use_tor', False): 
-      # (Tor config remains the same)
-      tor_port = self.config.get('tor_socks_port', 9150)
-      options.set_preference('network.proxy.type', 1)
-      options.set_preference('network.proxy.socks', '127.0.0.1')
-      options.set_preference('network.proxy.socks_port', tor_port)
-      options.set_preference('network.proxy.socks_version', 5)
-      options.set_preference("network.proxy.socks_remote_dns", True)
-      self.logger.info(f"Selenium Firefox configured to use Tor SOCKS proxy on 127.0.0.1:{tor_port}.")
-    else:
-      self.logger.info("Selenium Firefox will NOT use Tor proxy.")
-
+    # Fast mode emits items straight from SRP cards; item pages only for the fields/items configured below
+    self.srp_fast_mode = self.config.get('srp_fast_mode', False)
+    self.fast_mode_item_page_fields = self.config.get('fast_mode_item_page_fields', [])
+    self.fast_mode_item_page_only_new_items = self.config.get('fast_mode_item_page_only_new_items', True)
+    # With more than one tab, item pages are requested in batches and loaded side by side in one browser
+    self.tabs_per_browser = max(1, int(self.config.get('sites', {}).get(self.site_key, {}).get('tabs_per_browser', 1)))
+
+    # Driver provisioning is resolved once and cached; Firefox itself is only launched
+    # (in the background) once start_requests has validated the config.
+    self.provisioner = DriverProvisioner(
+      self.config,
+      resolve_state_path(self.config, self.config_path, 'driver_cache.json'),
+      self.custom_settings.get('USER_AGENT'),
+      self.logger
+    )
+    # The session recycles Firefox transparently once it has served too many pages,
+    # grown too large, or keeps hitting bot challenges.
+    self.circuit_pool = CircuitPool.from_config(self.config, self.logger)
+    if self.circuit_pool:
+      self.circuit_pool.probe() # Unreachable endpoints start on cooldown instead of failing the first launch
+    self.session = BrowserSession(
+      self.provisioner,
+      self.logger,
+      circuit_pool=self.circuit_pool,
+      max_pages=self.config.get('session_max_pages', 0),
+      max_rss_mb=self.config.get('session_max_rss_mb', 0),
+      max_bot_challenges=self.config.get('session_max_bot_challenges', 0),
+      rss_check_every=self.config.get('session_rss_check_every_pages', 10),
+      relaunch_interval=self.config.get('session_relaunch_interval_seconds', 30),
+      warm_up=self._warm_up_session
+    )
+    self.autocomplete_cache = AutocompleteCache(
+      resolve_state_path(self.config, self.config_path, 'autocomplete_cache.json'),
+      ttl_hours=self.config.get('autocomplete_cache_ttl_hours', 24)
+    )
+    self.seller_registry = SellerRegistry(
+      resolve_state_path(self.config, self.config_path, 'sellers.json'),
+      max_entries=self.config.get('seller_cache_max_entries', 5000),
+      ttl_hours=self.config.get('seller_cache_ttl_hours', 168)
+    )
+    self.selector_stats = SelectorStats(
+      resolve_state_path(self.config, self.config_path, 'selector_stats.json'),
+      self.logger,
+      min_samples=self.config.get('selector_stats_min_samples', 20),
+      drift_threshold=self.config.get('selector_drift_threshold', 0.5),
+      explore_every=self.config.get('selector_explore_every', 50)
+    )
+    self.seen_items = SeenItems(resolve_state_path(self.config, self.config_path, 'seen_items.json'))
+    # Item page novelty is scored from the last render, not the last SRP listing, so dropped items don't stay stale
+    self.rendered_items = SeenItems(resolve_state_path(self.config, self.config_path, 'rendered_items.json'))
+    self.query_planner = QueryPlanner(
+      resolve_state_path(self.config, self.config_path, 'query_stats.json'),
+      self.logger,
+      max_renders=self.config.get('max_srp_renders_per_run', 0),
+      pages_per_search=self.max_srp_pages,
+      subsume_max_extra_tokens=self.config.get('planner_subsume_max_extra_tokens', 1),
+      default_expected_yield=self.config.get('planner_default_expected_yield', 60.0)
+    )
+    # Item pages are prioritized by novelty, price vs category and keyword weight, within item_page_budget
+    priority_weights = self.config.get('item_priority_weights', {})
+    self.price_reference = None
+    if self.config.get('price_history_enabled', True):
+      self.price_reference = PriceHistoryStore(self.config.get('price_history_path') or resolve_state_path(self.config, self.config_path, 'price_history'))
+    self.item_scheduler = ItemScheduler(
+      self.logger,
+      budget=self.config.get('item_page_budget', 0),
+      keyword_weights=self.config.get('keyword_weights', {}),
+      default_keyword_weight=self.config.get('default_keyword_weight', 1.0),
+      novelty_weight=priority_weights.get('novelty', 0.6),
+      value_weight=priority_weights.get('value', 0.4),
+      revisit_after_hours=self.config.get('item_revisit_after_hours', 168),
+      defer_below=self.config.get('item_priority_defer_below', 0.3),
+      reference_price=self._reference_price if self.price_reference else None
+    )
+    self._srps_outstanding = 0 # Planned SRP requests not finished yet; held item pages are released at 0
+
+  @property
+  def driver(self):
+    # Blocks until the background launch finishes; None if Firefox could not be started
+    return self.session.driver
+
+  def _reference_price(self, keyword):
+    """Median recent price of a keyword's listings from the price history, None if unknown."""
+    since = time.time() - self.config.get('item_price_reference_days', 30) * 86400
     try:
-      self.logger.info("Initializing Selenium WebDriver with GeckoDriverManager...")
-      os.environ['WDM_LOG_LEVEL'] = '0' 
-      os.environ['WDM_PRINT_FIRST_LINE'] = 'False'
-      
-      # Give a path hints for GeckoDriver if webdriver_manager has issues sometimes
-      # geckodriver_path = GeckoDriverManager(path=self.config.get("geckodriver_path_hint", ".")).install()
-      geckodriver_path = GeckoDriverManager().install()
-      self.logger.info(f"GeckoDriver installed/found at: {geckodriver_path}")
-      
-      service = FirefoxService(executable_path=geckodriver_path)
-      self.driver = webdriver.Firefox(service=service, options=options)
-      
-      # Try to further hide webdriver flag after driver initialization
-      self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-      self.driver.execute_script("Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']})")
-      self.driver.execute_script("Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3]})") # Fake some plugins
-
-      # Set a common screen resolution via JS if arguments don't stick
-      # self.driver.execute_script(f"window.screen.availWidth = {screen_width}; window.screen.availHeight = {screen_height}; window.screen.width = {screen_width}; window.screen.height = {screen_height};")
-      # self.driver.execute_script(f"window.outerWidth = {screen_width}; window.outerHeight = {screen_height}; window.innerWidth = {screen_width}; window.innerHeight = {screen_height};")
-
-
-      self.logger.info("Selenium Firefox WebDriver initialized successfully.")
-    except WebDriverException as e:
-      self.logger.error(f"CRITICAL: WebDriverException during Selenium initialization: {e}")
-      self.logger.error("Check Firefox/GeckoDriver compatibility, versions, permissions, or if display is needed (if not headless).")
-      self.driver = None
+      distribution = self.price_reference.keyword_distribution(keyword, since=since)
     except Exception as e:
-      self.logger.error(f"CRITICAL: Failed to initialize Selenium WebDriver: {e}")
-      self.logger.error("Please ensure Firefox is installed. If using Tor, ensure Tor Browser is running and configured.")
-      self.driver = None
-
-  def _is_bot_challenge_page(self, current_driver: webdriver.Firefox):
-      """Checks if the current page is a bot challenge page."""
-      title = current_driver.title.lower()
-      url = current_driver.current_url.lower()
-      page_source = current_driver.page_source.lower()
-
-      challenge_keywords_title = ["pardon our interruption", "access denied", "are you a human", "checking your browser", "Distil", "Incapsula", "Akamai"]
-      challenge_keywords_url = ["challenge", "captcha", "distil_", "incap_"]
-      challenge_keywords_body = ["reference id:", "please verify you are human", "enable javascript and cookies", "completing the security check"]
-
-      if any(keyword in title for keyword in challenge_keywords_title):
-          return True
-      if any(keyword in url for keyword in challenge_keywords_url):
-          return True
-      if any(keyword in page_source for keyword in challenge_keywords_body):
-          # Be careful with body checks as legitimate pages might have "reference id" for other reasons
-          if "reference id:" in page_source and "checking your browser" in page_source: # More specific
-              return True
-      return False
+      self.logger.warning(f"Could not read price history for '{keyword}': {e}")
+      return None
+    return distribution.get('median') if distribution.get('count', 0) >= 5 else None
+
+  def _record_stage(self, stage, elapsed):
+    """Accumulates per-stage latency in the crawl stats (stage/<name>/count|seconds|max_seconds)."""
+    stats = getattr(getattr(self, 'crawler', None), 'stats', None)
+    if stats is None or elapsed is None:
+      return
+    stats.inc_value(f'stage/{stage}/count', spider=self)
+    stats.inc_value(f'stage/{stage}/seconds', elapsed, spider=self)
+    stats.max_value(f'stage/{stage}/max_seconds', elapsed, spider=self)
+
+  def _warm_up_session(self, driver):
+    """Visits the site's base URL on a freshly launched browser for cookies/session context."""
+    site_config = self.config.get('sites', {}).get(self.site_key)
+    if not site_config or not site_config.get('base_url'):
+      return
+    self.logger.info(f"Navigating to base URL: {site_config['base_url']} for cookies/session context.")
+    driver.get(site_config['base_url'])
+    time.sleep(random.uniform(self.config.get("selenium_general_delay_min", 1.5), 
+                              self.config.get("selenium_general_delay_max", 3.0)))
+    if self._is_bot_challenge_page(driver):
+      self.logger.warning(f"Bot challenge during session warm-up on {site_config['base_url']}.")
+
+  def _is_bot_challenge_page(self, current_driver: webdriver.Firefox, record=True):
+      """Checks if the current page is a bot challenge page.
+
+      record=False for a re-check of a page that was already counted (no new navigation)."""
+      is_challenge = is_bot_challenge(current_driver.title, current_driver.current_url, current_driver.page_source)
+      # Repeated challenges recycle the session; each one also rotates its proxy circuit
+      if record:
+          self.session.record_page_result(is_challenge)
+      return is_challenge
 
   def _load_config(self): # (Same as before)
     try:
@@ -186,49 +276,51 @@ class MainSpider(scrapy.Spider):
     for site_key, site_data in self.config.get('sites', {}).items():
       if 'base_url' in site_data and site_data.get('base_url'):
         try:
-          domains.append(urlparse(site_data['base_url']).netloc)
+          domains.append(urlparse(site_data['base_url']).hostname) # Scrapy's allowed_domains must not carry a port
         except Exception as e:
           self.logger.error(f"Error parsing base_url for site '{site_key}': {site_data.get('base_url')}, Error: {e}")
     return list(set(d for d in domains if d))
 
   def start_requests(self):
-      if not self.driver:
-          self.logger.error("Selenium WebDriver not initialized. Spider cannot start.")
-          return
+      # Config validation and cache lookups don't need the browser, so they run while it boots
       if not self.config.get('sites') or not self.base_keywords_to_search:
           self.logger.error("Configuration for 'sites' or 'base_keywords' missing in scraper_config.json.")
           return
 
-      site_key = 'ebay_us'
+      site_key = self.site_key
       site_config = self.config.get('sites', {}).get(site_key)
       if not site_config:
           self.logger.error(f"Configuration for site '{site_key}' not found in scraper_config.json.")
           return
 
+      self.session.start()
+
+      candidate_searches = []
       for base_keyword in self.base_keywords_to_search:
           self.logger.info(f"Processing base keyword: '{base_keyword}'")
-          try:
-              self.logger.info(f"Navigating to base URL: {site_config['base_url']} for cookies/session context.")
-              self.driver.get(site_config['base_url'])
-              time.sleep(random.uniform(self.config.get("selenium_general_delay_min", 1.5), 
-                                      self.config.get("selenium_general_delay_max", 3.0)))
-              if self._is_bot_challenge_page(self.driver):
-                  self.logger.error(f"Bot challenge on initial visit to {site_config['base_url']}. Skipping keyword '{base_keyword}'.")
-                  self._save_debug_page(f"initial_visit_bot_challenge_{sanitize_filename(base_keyword)}")
+          parsed_suggestions = None
+          if self.config.get('use_expanded_keywords', False):
+              # Produced offline by `python -m Scrapper.expansion`; the planner dedupes/budgets the long tail
+              parsed_suggestions = load_expanded_keywords(
+                  resolve_state_path(self.config, self.config_path, 'expanded_keywords.json'), site_key, base_keyword)
+              if parsed_suggestions is None:
+                  self.logger.warning(f"No expanded keywords stored for '{base_keyword}'; falling back to autocomplete.")
+              else:
+                  self.logger.info(f"Using {len(parsed_suggestions)} expanded search terms for '{base_keyword}'.")
+          if parsed_suggestions is None:
+              parsed_suggestions = self.autocomplete_cache.get(site_key, base_keyword)
+              if parsed_suggestions is not None:
+                  self.logger.info(f"Using {len(parsed_suggestions)} cached autocomplete suggestions for '{base_keyword}'.")
+          if parsed_suggestions is None:
+              lookup_started = time.time()
+              parsed_suggestions = self._lookup_autocomplete_suggestions(site_config, base_keyword, site_key)
+              self._record_stage('autocomplete', time.time() - lookup_started)
+              if parsed_suggestions is None:
+                  if not self.driver:
+                      self.logger.error("Selenium WebDriver not initialized. Spider cannot continue.")
+                      return
                   continue
-          except Exception as e:
-              self.logger.warning(f"Error during initial visit to base_url {site_config['base_url']}: {e}. Proceeding with autocomplete.")
-
-          autocomplete_html = self._fetch_autocomplete_html_with_selenium(site_config, base_keyword, site_key)
-          if not autocomplete_html:
-              self.logger.warning(f"No autocomplete HTML retrieved for '{base_keyword}' on site '{site_key}'. Skipping this base keyword.")
-              continue
-
-          parsed_suggestions = self._parse_autocomplete_suggestions(
-              autocomplete_html,
-              site_config.get('autocomplete_parser_type'),
-              site_config
-          )
+              self.autocomplete_cache.put(site_key, base_keyword, parsed_suggestions)
           self.logger.info(f"Found {len(parsed_suggestions)} suggestions for base keyword '{base_keyword}'.")
 
           for suggestion_idx, suggestion in enumerate(parsed_suggestions):
@@ -240,35 +332,24 @@ class MainSpider(scrapy.Spider):
                   self.logger.debug(f"Suggestion {suggestion_idx} for '{base_keyword}' has no search_term. Skipping.")
                   continue
 
-              is_suggestion_valid = False
-              final_cat_name_for_url = None
-              final_cat_id_for_url = None
               allowed_kw_list = site_config.get('allowed_category_keywords', [])
-
-              if cat_name and cat_id:
-                  category_passes_filter = not allowed_kw_list or \
-                      any(kw.lower() in cat_name.lower() for kw in allowed_kw_list)
-                  if category_passes_filter:
-                      is_suggestion_valid = True
-                      final_cat_name_for_url = cat_name
-                      final_cat_id_for_url = cat_id
-                      self.logger.debug(f"Using suggestion: '{search_term}' in category '{cat_name} ({cat_id})'")
-                  else:
+              allow_uncategorized = site_config.get('allow_search_without_category_if_suggestion_had_no_category', False)
+              if not category_allowed(suggestion, allowed_kw_list, allow_uncategorized):
+                  if cat_name and cat_id:
                       self.logger.debug(f"Discarding suggestion '{search_term}' in category '{cat_name}' (did not pass keyword filter).")
-                      continue
-              else:
-                  if site_config.get('allow_search_without_category_if_suggestion_had_no_category', False):
-                      is_suggestion_valid = True
-                      final_cat_id_for_url = '0'
-                      final_cat_name_for_url = "All Categories"
-                      self.logger.debug(f"Using suggestion: '{search_term}' (no specific category from autocomplete, searching all).")
                   else:
                       self.logger.debug(f"Discarding suggestion '{search_term}' (no category, and not allowed to search without).")
-                      continue
-
-              if not is_suggestion_valid:
                   continue
 
+              if cat_name and cat_id:
+                  final_cat_name_for_url = cat_name
+                  final_cat_id_for_url = cat_id
+                  self.logger.debug(f"Using suggestion: '{search_term}' in category '{cat_name} ({cat_id})'")
+              else:
+                  final_cat_id_for_url = '0'
+                  final_cat_name_for_url = "All Categories"
+                  self.logger.debug(f"Using suggestion: '{search_term}' (no specific category from autocomplete, searching all).")
+
               srp_url = None
               encoded_search_term = quote_plus(search_term)
               template_with_cat = site_config.get('search_url_template_with_category')
@@ -291,7 +372,6 @@ class MainSpider(scrapy.Spider):
                   continue
 
               if srp_url:
-                  self.logger.info(f"Yielding initial SRP request for processing with Selenium: {srp_url} (derived from '{base_keyword}')")
                   meta_for_srp = {
                       'derived_from_keyword': base_keyword,
                       'category_context_from_search': final_cat_name_for_url,
@@ -299,26 +379,131 @@ class MainSpider(scrapy.Spider):
                       'srp_url': srp_url,
                       'site_key': site_key
                   }
-                  yield scrapy.Request(srp_url,
-                                      callback=self.process_srp_with_selenium,
-                                      meta=meta_for_srp,
-                                      dont_filter=True)
+                  candidate_searches.append({
+                      'url': srp_url,
+                      'search_term': search_term,
+                      'category_id': str(final_cat_id_for_url),
+                      'meta': meta_for_srp
+                  })
+
+      self.autocomplete_cache.save()
+
+      # Overlapping suggestions are deduplicated, ranked by expected new-item yield and budgeted
+      planned_searches = self.query_planner.plan(candidate_searches)
+      self._srps_outstanding = len(planned_searches)
+      for rank, search in enumerate(planned_searches):
+          meta_for_srp = search['meta']
+          meta_for_srp['canonical_srp_url'] = search['canonical_url']
+          meta_for_srp['merged_search_terms'] = search.get('merged_search_terms', [])
+          self.logger.info(f"Yielding initial SRP request for processing with Selenium: {search['url']} (derived from '{meta_for_srp['derived_from_keyword']}', score {search['planner_score']:.1f})")
+          yield scrapy.Request(search['url'],
+                              callback=self.process_srp_with_selenium,
+                              errback=self.srp_request_failed,
+                              meta=meta_for_srp,
+                              priority=-rank, # Best searches first; their item pages are held until all searches are done
+                              dont_filter=True)
+
+  def _lookup_autocomplete_suggestions(self, site_config, base_keyword, site_key):
+      """Types the keyword into the site's search bar and parses the suggestions. None on failure."""
+      if not self.driver:
+          return None
+      try:
+          # The warm-up already left a fresh session on the base URL (and counted its result); only navigate when we moved away
+          navigated = False
+          if urlparse(self.driver.current_url).path.strip('/') or urlparse(self.driver.current_url).netloc != urlparse(site_config['base_url']).netloc:
+              self.logger.info(f"Navigating to base URL: {site_config['base_url']} for autocomplete.")
+              self.session.get(site_config['base_url'])
+              navigated = True
+              time.sleep(random.uniform(self.config.get("selenium_general_delay_min", 1.5), 
+                                      self.config.get("selenium_general_delay_max", 3.0)))
+          if self._is_bot_challenge_page(self.driver, record=navigated):
+              self.logger.error(f"Bot challenge on initial visit to {site_config['base_url']}. Skipping keyword '{base_keyword}'.")
+              self._save_debug_page(f"initial_visit_bot_challenge_{sanitize_filename(base_keyword)}")
+              return None
+      except Exception as e:
+          self.logger.warning(f"Error during initial visit to base_url {site_config['base_url']}: {e}. Proceeding with autocomplete.")
 
+      autocomplete_html = self._fetch_autocomplete_html_with_selenium(site_config, base_keyword, site_key)
+      if not autocomplete_html:
+          self.logger.warning(f"No autocomplete HTML retrieved for '{base_keyword}' on site '{site_key}'. Skipping this base keyword.")
+          return None
+
+      return self._parse_autocomplete_suggestions(
+          autocomplete_html,
+          site_config.get('autocomplete_parser_type'),
+          site_config
+      )
 
   def process_srp_with_selenium(self, response):
+    try:
+      yield from self._render_srp_pages(response)
+    except Exception as e:
+      self.logger.error(f"Error processing SRP {response.meta.get('srp_url')}: {e}")
+    yield from self._srp_finished()
+
+  def srp_request_failed(self, failure):
+    self.logger.warning(f"SRP request {failure.request.url} failed: {failure.value!r}")
+    yield from self._srp_finished()
+
+  def _srp_finished(self):
+    """After the last planned SRP, the held item pages are ranked across all searches and scheduled."""
+    self._srps_outstanding -= 1
+    if self._srps_outstanding > 0:
+      return []
+    return self._release_item_pages()
+
+  def _release_item_pages(self):
+      outputs = []
+      admitted = []
+      for priority, score, item_meta_dict in self.item_scheduler.release():
+          if priority is None:
+              self.crawler.stats.inc_value('scheduler/item_pages_dropped', spider=self)
+              outputs.extend(self._srp_card_fallback(item_meta_dict['meta'])) # The card is still worth keeping without its item page
+              continue
+          if self.tabs_per_browser > 1:
+              admitted.append((priority, item_meta_dict))
+              continue
+          outputs.append(scrapy.Request(item_meta_dict['url'], # URL for Scrapy tracking
+                                        callback=self.process_item_page_with_selenium,
+                                        errback=self.item_page_request_failed,
+                                        meta=item_meta_dict['meta'],
+                                        priority=priority,
+                                        dont_filter=True))
+
+      # Multi-tab mode: release() is best first, so similarly scored items share a batch and the batch priority fits all of them
+      for start in range(0, len(admitted), self.tabs_per_browser):
+          batch = admitted[start:start + self.tabs_per_browser]
+          outputs.append(scrapy.Request(batch[0][1]['url'], # URL for Scrapy tracking
+                                        callback=self.process_item_batch_with_selenium,
+                                        errback=self.item_batch_request_failed,
+                                        meta={'item_batch': [entry[1]['meta'] for entry in batch]},
+                                        priority=batch[0][0],
+                                        dont_filter=True))
+      if outputs:
+          self.logger.info(f"All planned searches done; releasing {len(outputs)} item page requests/cards, best first.")
+      return outputs
+
+  def _render_srp_pages(self, response):
     meta = response.meta 
     current_srp_url = meta['srp_url'] # Use the URL passed in meta for the first page
+    if not self.driver:
+      self.logger.error(f"Selenium WebDriver not initialized. Skipping SRP {current_srp_url}.")
+      return
     
     page_count = 0
 
     while current_srp_url and page_count < self.max_srp_pages:
+      if not self.query_planner.consume_render():
+        self.logger.info(f"SRP render budget exhausted; not loading {current_srp_url}.")
+        break
       page_count += 1
       self.logger.info(f"Selenium navigating to SRP page {page_count}/{self.max_srp_pages}: {current_srp_url}")
       
+      render_started = time.time()
       try:
         time.sleep(random.uniform(self.config.get("selenium_srp_delay_min", 2.0), 
                                  self.config.get("selenium_srp_delay_max", 4.5)))
-        self.driver.get(current_srp_url)
+        self.session.get(current_srp_url)
         
         if self._is_bot_challenge_page(self.driver):
             self.logger.error(f"BOT DETECTION on SRP: {self.driver.current_url}. Title: '{self.driver.title}'. Stopping this search.")
@@ -351,14 +536,30 @@ class MainSpider(scrapy.Spider):
           request=response.request 
       )
       selenium_rendered_response.meta.update(meta)
+      self._record_stage('srp_render', time.time() - render_started)
 
+      parse_started = time.time()
       item_url_metas, next_page_srp_url_from_parser = self._extract_item_urls_and_next_srp(selenium_rendered_response)
+      self._record_stage('srp_parse', time.time() - parse_started)
+
+      listed_item_ids = [m['card_item'].get('item_id') for m in item_url_metas]
+      listed_item_ids = [item_id for item_id in listed_item_ids if item_id]
+      new_item_count = self.seen_items.mark(listed_item_ids)
+      self.query_planner.record_result(meta.get('canonical_srp_url') or current_srp_url, len(listed_item_ids), new_item_count)
+      self.logger.info(f"SRP page {page_count} listed {len(listed_item_ids)} items, {new_item_count} never seen before.")
       
+      self.item_scheduler.observe_prices([m['card_item'] for m in item_url_metas])
       for item_meta_dict in item_url_metas:
-          yield scrapy.Request(item_meta_dict['url'], # URL for Scrapy tracking
-                               callback=self.process_item_page_with_selenium,
-                               meta=item_meta_dict['meta'], 
-                               dont_filter=True)
+          card_item = item_meta_dict['card_item']
+          # "New" means its item page was never rendered: a listing seen before whose page was dropped or failed still qualifies
+          never_rendered = bool(card_item.get('item_id')) and self.rendered_items.last_seen(card_item['item_id']) is None
+          if self.srp_fast_mode and not self._needs_item_page(card_item, never_rendered):
+              yield card_item
+              continue
+          score = self.item_scheduler.score(card_item, self.rendered_items.last_seen(card_item.get('item_id')),
+                                            search_term=meta.get('search_term_used_on_srp'))
+          item_meta_dict['meta']['item_priority_score'] = score
+          self.item_scheduler.hold(score, item_meta_dict)
 
       if next_page_srp_url_from_parser:
           current_srp_url = next_page_srp_url_from_parser 
@@ -373,16 +574,27 @@ class MainSpider(scrapy.Spider):
   def process_item_page_with_selenium(self, response):
       meta_for_item_page = response.meta 
       item_url = meta_for_item_page['item_url_to_load_with_selenium']
+      if not self.driver:
+          self.logger.error(f"Selenium WebDriver not initialized. Skipping item {item_url}.")
+          yield from self._srp_card_fallback(meta_for_item_page)
+          return
+      if not self.item_scheduler.consume_render():
+          self.logger.debug(f"Item page budget exhausted; not loading {item_url} (score {meta_for_item_page.get('item_priority_score', 0):.2f}).")
+          self.crawler.stats.inc_value('scheduler/item_pages_dropped', spider=self)
+          yield from self._srp_card_fallback(meta_for_item_page)
+          return
 
       self.logger.info(f"Selenium navigating to ITEM page: {item_url}")
+      render_started = time.time()
       try:
           time.sleep(random.uniform(self.config.get("selenium_item_page_delay_min", 2.5), 
                                    self.config.get("selenium_item_page_delay_max", 5.5)))
-          self.driver.get(item_url)
+          self.session.get(item_url)
 
           if self._is_bot_challenge_page(self.driver):
               self.logger.error(f"BOT DETECTION on ITEM page: {self.driver.current_url}. Title: '{self.driver.title}'. Skipping item.")
               self._save_debug_page(f"item_bot_detection_{sanitize_filename(meta_for_item_page.get('title_from_srp', 'unknown_item'))}")
+              yield from self._srp_card_fallback(meta_for_item_page)
               return 
 
           WebDriverWait(self.driver, self.selenium_timeout).until(
@@ -398,10 +610,12 @@ class MainSpider(scrapy.Spider):
       except TimeoutException:
           self.logger.warning(f"Timeout on ITEM page {item_url}. Skipping.")
           self._save_debug_page(f"item_timeout_{sanitize_filename(meta_for_item_page.get('title_from_srp', 'unknown_item'))}")
+          yield from self._srp_card_fallback(meta_for_item_page)
           return
       except Exception as e:
           self.logger.error(f"Error during Selenium ITEM page nav to {item_url}: {e}")
           self._save_debug_page(f"item_error_{sanitize_filename(meta_for_item_page.get('title_from_srp', 'unknown_item'))}")
+          yield from self._srp_card_fallback(meta_for_item_page)
           return
 
       item_page_response = HtmlResponse(
@@ -411,10 +625,107 @@ class MainSpider(scrapy.Spider):
           request=response.request 
       )
       item_page_response.meta.update(meta_for_item_page) 
+      self._record_stage('item_render', time.time() - render_started)
 
-      for item in self.parse_item_page(item_page_response):
+      parse_started = time.time()
+      results = list(self.parse_item_page(item_page_response))
+      self._record_stage('item_parse', time.time() - parse_started)
+      self._mark_item_page_rendered(meta_for_item_page)
+      for item in results:
           yield item
 
+  def item_page_request_failed(self, failure):
+      # The placeholder HTTP download failed before the browser was involved; keep the card in fast mode
+      self.logger.warning(f"Item page request {failure.request.url} failed: {failure.value!r}")
+      yield from self._srp_card_fallback(failure.request.meta)
+
+  def _mark_item_page_rendered(self, meta):
+      item_id = (meta.get('srp_card') or {}).get('item_id') or extract_item_id(meta.get('item_url_to_load_with_selenium'))
+      if item_id:
+          self.rendered_items.mark([item_id])
+
+  def _srp_card_fallback(self, meta):
+      """Fast mode: the card held back for its item page, emitted when that page can't be used."""
+      if self.srp_fast_mode and meta.get('srp_card') is not None:
+          return [ScrapperItem(meta['srp_card'])]
+      return []
+
+  def process_item_batch_with_selenium(self, response):
+      """Loads a batch of item pages in parallel tabs and parses each one as soon as it is ready."""
+      metas = []
+      for meta_for_item_page in response.meta['item_batch']:
+          if self.item_scheduler.consume_render():
+              metas.append(meta_for_item_page)
+              continue
+          self.crawler.stats.inc_value('scheduler/item_pages_dropped', spider=self)
+          yield from self._srp_card_fallback(meta_for_item_page)
+      if not metas:
+          return
+      if not self.driver:
+          self.logger.error(f"Selenium WebDriver not initialized. Skipping {len(metas)} items.")
+          for meta_for_item_page in metas:
+              yield from self._srp_card_fallback(meta_for_item_page)
+          return
+
+      metas_by_url = {m['item_url_to_load_with_selenium']: m for m in metas}
+      # Pages are parsed as they become ready, but output is only handed to Scrapy once the batch is done:
+      # another callback must not drive the browser while its tabs are in flight
+      results = []
+      parsed_urls = set()
+      self.logger.info(f"Selenium loading {len(metas)} ITEM pages in up to {self.tabs_per_browser} tabs.")
+      try:
+          pages = self.session.load_in_tabs(
+              list(metas_by_url),
+              self.tabs_per_browser,
+              "h1.x-item-title__mainTitle, h1#itemTitle, div.x-price-primary, span#prcIsum, #desc_ifr",
+              timeout=self.selenium_timeout,
+              dispatch_delay=lambda: random.uniform(self.config.get("tab_dispatch_delay_min", 0.3),
+                                                    self.config.get("tab_dispatch_delay_max", 1.0))
+          )
+          for page in pages:
+              meta_for_item_page = metas_by_url[page['url']]
+              debug_name = sanitize_filename(meta_for_item_page.get('title_from_srp', 'unknown_item'))
+              if page['error']:
+                  self.logger.error(f"Error during Selenium ITEM page nav to {page['url']}: {page['error']}")
+                  continue
+              if page['timed_out']:
+                  self.logger.warning(f"Timeout on ITEM page {page['url']}. Skipping.")
+                  self._save_debug_page(f"item_timeout_{debug_name}")
+                  continue
+              if page['bot_challenge']:
+                  self.logger.error(f"BOT DETECTION on ITEM page: {page['current_url']}. Title: '{page['title']}'. Skipping item.")
+                  self._save_debug_page(f"item_bot_detection_{debug_name}")
+                  continue
+              self._record_stage('item_render', page['elapsed'])
+
+              # Each page gets its own request so the meta of one item can't leak into another
+              item_page_response = HtmlResponse(
+                  url=page['current_url'],
+                  body=page['page_source'],
+                  encoding='utf-8',
+                  request=response.request.replace(url=page['url'], meta=dict(meta_for_item_page))
+              )
+              parse_started = time.time()
+              results.extend(self.parse_item_page(item_page_response))
+              self._record_stage('item_parse', time.time() - parse_started)
+              self._mark_item_page_rendered(meta_for_item_page)
+              parsed_urls.add(page['url'])
+      except WebDriverException as e:
+          self.logger.error(f"Error loading item batch in tabs: {e}")
+      # Errors, timeouts, bot challenges and pages never reached keep their SRP card in fast mode
+      for url, meta_for_item_page in metas_by_url.items():
+          if url not in parsed_urls:
+              results.extend(self._srp_card_fallback(meta_for_item_page))
+      for item in results:
+          yield item
+
+  def item_batch_request_failed(self, failure):
+      # Only the first item's URL was downloaded as the batch placeholder; every item in the batch keeps its card
+      batch = failure.request.meta['item_batch']
+      self.logger.warning(f"Item batch request {failure.request.url} failed ({len(batch)} items): {failure.value!r}")
+      for meta_for_item_page in batch:
+          yield from self._srp_card_fallback(meta_for_item_page)
+
   def _fetch_autocomplete_html_with_selenium(self, site_config, keyword, site_key): 
     # This method should largely remain the same as your last working version,
     # ensuring it uses the random delays from config.
@@ -520,16 +831,19 @@ class MainSpider(scrapy.Spider):
         price_from_search = "".join(listing.css('span.s-item__price ::text').getall()).strip()
         price_from_search = price_from_search if price_from_search else None
 
+        card_item = self._parse_srp_card(listing, response, item_url_absolute, title_from_search, price_from_search)
+
         meta_for_item_detail_page = {
           'derived_from_keyword': meta.get('derived_from_keyword'),
           'category_context_from_search': meta.get('category_context_from_search'),
           'search_term_used_on_srp': meta.get('search_term_used_on_srp'),
           'title_from_srp': title_from_search,
           'price_from_srp': price_from_search,
+          'srp_card': dict(card_item),
           'srp_url': response.url,
           'item_url_to_load_with_selenium': item_url_absolute
         }
-        item_url_meta_list.append({'url': item_url_absolute, 'meta': meta_for_item_detail_page})
+        item_url_meta_list.append({'url': item_url_absolute, 'meta': meta_for_item_detail_page, 'card_item': card_item})
     
     next_page_srp_url = None
     next_page_href = response.css('a.pagination__next[href]::attr(href), a[rel="next"][href]::attr(href)').get() # Combined selector
@@ -558,9 +872,62 @@ class MainSpider(scrapy.Spider):
     return item_url_meta_list, next_page_srp_url
 
 
+  def _parse_srp_card(self, listing, response, item_url, title, price):
+    """Builds a ScrapperItem from everything a search result card exposes (no item page visit)."""
+    meta = response.meta
+    item = ScrapperItem()
+    item['derived_from_keyword'] = meta.get('derived_from_keyword')
+    item['category_context_from_search'] = meta.get('category_context_from_search')
+    item['category'] = meta.get('category_context_from_search')
+    item['link'] = item_url.split('?')[0]
+    item['item_id'] = extract_item_id(item_url)
+    if title and title.lower().startswith('new listing'): title = title[len('new listing'):].strip()
+    item['title'] = title
+    item['price'] = price
+
+    condition_text = " ".join(t.strip() for t in listing.css('div.s-item__subtitle span.SECONDARY_INFO::text, span.SECONDARY_INFO::text').getall() if t.strip())
+    item['condition'] = condition_text or None
+    shipping_text = " ".join(t.strip() for t in listing.css('span.s-item__shipping ::text, span.s-item__logisticsCost ::text, span.s-item__freeXDays ::text').getall() if t.strip())
+    item['shipping'] = shipping_text or None
+    location_text = listing.css('span.s-item__location::text, span.s-item__itemLocation ::text').get()
+    if location_text:
+      location_text = location_text.strip()
+      if location_text.lower().startswith('from '): location_text = location_text[5:].strip()
+    item['location'] = location_text or None
+    returns_text = " ".join(listing.css('span.s-item__free-returns ::text, span.s-item__returns ::text').getall()).lower()
+    item['free_returns'] = "free returns" in returns_text
+
+    thumbnail = listing.css('div.s-item__image-wrapper img::attr(src), div.s-item__image img::attr(src)').get()
+    if not thumbnail or thumbnail.startswith('data:') or 'gif' in thumbnail.lower():
+      thumbnail = listing.css('div.s-item__image-wrapper img::attr(data-src), div.s-item__image img::attr(data-src)').get()
+    item['thumbnail'] = response.urljoin(thumbnail) if thumbnail else None
+    item['image_urls'] = []
+
+    # Seller snippet, e.g. "some_seller (1,234) 99.5%"
+    seller_snippet = " ".join(t.strip() for t in listing.css('span.s-item__seller-info-text ::text, span.s-item__seller-info ::text').getall() if t.strip())
+    seller_match = re.match(r'\s*(\S+)\s*\((\d[\d,]*)\)\s*(\d{1,3}(?:\.\d+)?%)?', seller_snippet)
+    seller_fields = {f: None for f in SELLER_FIELDS}
+    if seller_match:
+      seller_fields['seller_name'] = seller_match.group(1)
+      seller_fields['seller_feedback_count'] = seller_match.group(2)
+      if seller_match.group(3): seller_fields['seller_rating'] = f"{seller_match.group(3)} Positive feedback"
+    seller_fields['top_rated_seller'] = bool(listing.css('span.s-item__etrs-badge, span.s-item__etrs-text, span[class*="TOP_RATED"]').get())
+    seller_id, seller_fields = self.seller_registry.resolve(seller_fields)
+    item.update(seller_fields)
+    item['seller_id'] = seller_id
+    return item
+
+  def _needs_item_page(self, card_item, is_new_item):
+    """Fast mode: an item page is only rendered when a configured field is missing from the card."""
+    if not self.fast_mode_item_page_fields:
+      return False
+    if self.fast_mode_item_page_only_new_items and not is_new_item:
+      return False
+    return any(card_item.get(field_name) in (None, "", []) for field_name in self.fast_mode_item_page_fields)
+
   def _save_debug_page(self, filename_base, response_obj=None):# (Same as before)
     try:
-        if self.driver:
+        if self.session.current():
             # Ensure directory exists (e.g., Scrapper/Scrapper/debug_pages/)
             debug_dir = os.path.join(os.path.dirname(__file__), 'debug_pages')
             os.makedirs(debug_dir, exist_ok=True)
@@ -589,39 +956,30 @@ class MainSpider(scrapy.Spider):
     item['derived_from_keyword'] = item_data_from_meta.get('derived_from_keyword')
     item['category_context_from_search'] = item_data_from_meta.get('category_context_from_search')
     item['link'] = response.url
+    item['item_id'] = extract_item_id(response.url) or (item_data_from_meta.get('srp_card') or {}).get('item_id')
     
-    title_text = response.css('h1.x-item-title__mainTitle span.ux-textspans::text').get()
-    if not title_text: 
-      title_text = response.css('h1#itemTitle span.ux-textspans--BOLD::text').get()
-      if not title_text: title_text = response.css('h1#itemTitle ::text').get() 
-      if title_text: title_text = title_text.replace("Details about", "").strip()
+    stats = self.selector_stats
+    title_text = stats.first('title', TITLE_SELECTORS, lambda sel: select_text(response, sel))
+    if title_text: title_text = title_text.replace("Details about", "").strip() # Legacy layout prefix
 
     if not title_text: title_text = item_data_from_meta.get('title_from_srp')
     item['title'] = title_text.strip() if title_text else None
 
-    price_text = "".join(response.css('div.x-price-primary span.ux-textspans::text').getall()).strip()
-    if not price_text: 
-        price_text = response.css('span#prcIsum::text, span#mm-saleDscPrc::text, div[data-testid="item-price"] span.ux-textspans::text').get()
+    price_text = stats.first('price', PRICE_SELECTORS, lambda sel: select_text(response, sel, join=True))
     if not price_text: price_text = item_data_from_meta.get('price_from_srp')
     item['price'] = price_text.strip() if price_text else None
 
-    desc_html_content = response.css('div#desc_module div#ds_div, div#desc_div').get()
-    if not desc_html_content: desc_html_content = response.css('div#descriptioncontent, section#description ~ div[class*="vim"], div#viTabs_0_is').get() 
+    desc_html_content = stats.first('description', DESCRIPTION_SELECTORS, lambda sel: response.css(sel).get())
 
+    desc_iframe_url = None
     if desc_html_content:
-      soup_desc = BeautifulSoup(desc_html_content, 'html.parser')
-      for s_tag in soup_desc(['script', 'style']): s_tag.decompose() # Corrected variable name
-      item['description'] = soup_desc.get_text(separator=' ', strip=True)
+      item['description'] = self._extract_description_text(desc_html_content)
     else:
       iframe_src = response.css('iframe#desc_ifr::attr(src)').get()
       if iframe_src: 
-          # TODO: If iframe content is vital, you need another Selenium navigation step here.
-          # For now, just noting the iframe.
-          # self.driver.get(response.urljoin(iframe_src))
-          # iframe_content = self.driver.page_source
-          # soup_iframe_desc = BeautifulSoup(iframe_content, 'html.parser')
-          # item['description'] = soup_iframe_desc.get_text(separator=' ', strip=True)
-          item['description'] = f"Description in iframe (content not fetched): {response.urljoin(iframe_src)}"
+          # The iframe is plain HTML, so it is fetched over HTTP (see below) instead of a second browser navigation
+          desc_iframe_url = response.urljoin(iframe_src)
+          item['description'] = f"Description in iframe (content not fetched): {desc_iframe_url}"
       else: item['description'] = None
     
     image_urls_found = []
@@ -669,10 +1027,7 @@ class MainSpider(scrapy.Spider):
       item['category'] = " > ".join(filtered_breadcrumbs) if filtered_breadcrumbs else " > ".join([b.strip() for b in breadcrumbs_texts if b.strip()])
     else: item['category'] = item_data_from_meta.get('category_context_from_search')
 
-    condition_text = "".join(response.css('div[data-testid="x-item-condition"] div.ux-labels-values__values-content span.ux-textspans::text, div.d-item-condition span.ux-textspans::text').getall()).strip()
-    if not condition_text:
-        condition_in_specifics = response.xpath("//div[contains(@class, 'ux-labels-values__labels') and (.//span[contains(translate(text(), 'CONDITION', 'condition'), 'condition')] or .//span[contains(translate(text(), 'Condition', 'condition'), 'Condition')])]/following-sibling::div[contains(@class, 'ux-labels-values__values')]//span/text()").getall()
-        if condition_in_specifics: condition_text = " ".join(c.strip() for c in condition_in_specifics).strip()
+    condition_text = stats.first('condition', CONDITION_SELECTORS, lambda sel: select_text(response, sel, join=True))
     item['condition'] = condition_text.strip() if condition_text else None
 
     specifics_dict = {}
@@ -693,8 +1048,10 @@ class MainSpider(scrapy.Spider):
             if label_el_str and value_el_str and label_el_str not in specifics_dict: 
                 specifics_dict[label_el_str] = value_el_str
     
-    if not specifics_dict or len(specifics_dict) < 3: 
-      for row_selector_el in response.css('div.itemAttr table tr, div.item-specifics table tr, table.vi-ia-tb tr'): # Renamed row_selector
+    # The legacy specifics-table fallback is skipped once it has proven to never match (probed now and then)
+    if (not specifics_dict or len(specifics_dict) < 3) and stats.should_try('specifics', SPECIFICS_TABLE_FALLBACK): 
+      specifics_before_fallback = len(specifics_dict)
+      for row_selector_el in response.css(SPECIFICS_TABLE_FALLBACK): # Renamed row_selector
         label_text_from_row_el = row_selector_el.css('td.attrLabels::text, th::text, td.x-item-specifics__label::text').get() # Renamed
         
         value_str = None # Renamed value
@@ -719,6 +1076,7 @@ class MainSpider(scrapy.Spider):
             clean_label_str = label_text_from_row_el.strip().lower().replace(':', '').rstrip() # Renamed
             if clean_label_str and clean_label_str not in specifics_dict:
                 specifics_dict[clean_label_str] = value_str
+      stats.record('specifics', SPECIFICS_TABLE_FALLBACK, len(specifics_dict) > specifics_before_fallback)
     
     item['brand'] = specifics_dict.get('brand')
     item['location'] = specifics_dict.get('item location', specifics_dict.get('location'))
@@ -726,37 +1084,153 @@ class MainSpider(scrapy.Spider):
     returns_text_str = " ".join(p.strip() for p in returns_text_list).lower() # Renamed
     item['free_returns'] = any(phrase in returns_text_str for phrase in ["free returns", "freereturns", "free 30 day returns"])
     
-    seller_name_text = response.css('div.x-sellercard-atf__info__about-seller a span.ux-textspans::text, span.ux-seller-section__ μέροςMark span.ux-textspans--PSEUDONYM::text, div.ux-seller-section__item--seller a span.ux-textspans::text, a[data-testid="seller-profile-link"] span span::text, div.ux-seller-section__item--seller span[class*="ux-textspans"]::text').get() # Renamed
+    seller_name_text = stats.first('seller_name', SELLER_NAME_SELECTORS, lambda sel: response.css(sel).get())
     item['seller_name'] = seller_name_text.strip() if seller_name_text else None
-    
-    feedback_count_str_raw = response.css('div.x-sellercard-atf__info__about-seller a.ux-action[aria-label*="feedback score"] span[aria-hidden="true"]::text, span.ux-seller-section__item--feedbackscore span.ux-textspans::text, a[data-testid="seller-profile-link"] span.ux-textspans--SECONDARY::text, div.ux-seller-section__item--feedbackscore span[class*="ux-textspans"]::text').get() # Renamed
-    if feedback_count_str_raw:
-        feedback_match_obj = re.search(r'\((\d[\d,]*(?:\.\d+)?)\)', feedback_count_str_raw) # Renamed
-        item['seller_feedback_count'] = feedback_match_obj.group(1).strip() if feedback_match_obj else feedback_count_str_raw.strip()
-    else: item['seller_feedback_count'] = None
-
-    positive_feedback_text = response.css('div.x-sellercard-atf__info__rating span.ux-textspans--PERCENTAGE, div.ux-seller-section__item--positive-feedback span.ux-textspans--SENTIMENT_POSITIVE::text, div[data-testid="seller-score"] span.ux-textspans--سجل::text, div.ux-seller-section__item--positivefeedback span[class*="ux-textspans"]::text').get() # Renamed
-    item['seller_rating'] = positive_feedback_text.strip() if positive_feedback_text else None
-    
-    seller_link_attr = response.css('div.x-sellercard-atf__info__about-seller a.ux-action[aria-label*="feedback score"]::attr(href), a.ux-seller-section__action[aria-label*="feedback score"]::attr(href), div.ux-seller-section__item--seller a::attr(href), a[data-testid="seller-profile-link"]::attr(href)').get() # Renamed
+    seller_link_attr = stats.first('seller_link', SELLER_LINK_SELECTORS, lambda sel: response.css(sel).get())
     item['seller_link'] = response.urljoin(seller_link_attr) if seller_link_attr else None
-    
-    item['top_rated_seller'] = bool(response.css('span.ux-icon--TOP_RATED_PLUS_SEAL, div.ux-seller-section__item--TOP_RATED_PLUS_PROGRAM span.ux-icon--TOP_RATED_PLUS_PROGRAM, svg[aria-label="Top Rated Seller"], span[title="Top Rated Seller"], span.ux-icon--TRS_PROGRAM_VISUAL_INDICATOR').get())
+
+    # Sellers repeat across many listings: when the registry already has a fresh, complete
+    # profile for this seller, the remaining selector chains are skipped entirely.
+    seller_id = seller_id_for(item['seller_name'], item['seller_link'])
+    if self.seller_registry.is_complete(seller_id):
+      for field_name in ('seller_feedback_count', 'seller_rating', 'top_rated_seller'): item[field_name] = None
+    else:
+      feedback_count_str_raw = stats.first('seller_feedback_count', SELLER_FEEDBACK_SELECTORS, lambda sel: response.css(sel).get())
+      if feedback_count_str_raw:
+          feedback_match_obj = re.search(r'\((\d[\d,]*(?:\.\d+)?)\)', feedback_count_str_raw) # Renamed
+          item['seller_feedback_count'] = feedback_match_obj.group(1).strip() if feedback_match_obj else feedback_count_str_raw.strip()
+      else: item['seller_feedback_count'] = None
+
+      positive_feedback_text = stats.first('seller_rating', SELLER_RATING_SELECTORS, lambda sel: response.css(sel).get())
+      item['seller_rating'] = positive_feedback_text.strip() if positive_feedback_text else None
+
+      item['top_rated_seller'] = bool(response.css('span.ux-icon--TOP_RATED_PLUS_SEAL, div.ux-seller-section__item--TOP_RATED_PLUS_PROGRAM span.ux-icon--TOP_RATED_PLUS_PROGRAM, svg[aria-label="Top Rated Seller"], span[title="Top Rated Seller"], span.ux-icon--TRS_PROGRAM_VISUAL_INDICATOR').get())
     item['seller_verified'] = None 
+
+    # Card fields (shipping, thumbnail, ...) fill whatever the item page didn't provide. The card's
+    # rating/feedback were already merged with the registry, so they come back through resolve() instead.
+    for field_name, value in (item_data_from_meta.get('srp_card') or {}).items():
+      if field_name in PROFILE_FIELDS: continue
+      if item.get(field_name) in (None, "", []) and value not in (None, "", []): item[field_name] = value
+
+    seller_id, seller_fields = self.seller_registry.resolve({f: item.get(f) for f in SELLER_FIELDS})
+    item.update(seller_fields)
+    item['seller_id'] = seller_id
+
+    if self.config.get('seller_profile_enrichment', False) and item.get('seller_link') and self.seller_registry.needs_enrichment(seller_id):
+      # One profile fetch per seller (not per item), over plain HTTP
+      yield scrapy.Request(item['seller_link'],
+                           callback=self.parse_seller_profile,
+                           meta={'seller_id': seller_id, 'allow_offsite': True},
+                           dont_filter=True)
     # ------- End of parse_item_page logic --------
+    if desc_iframe_url and self.config.get('fetch_description_iframe', True):
+      # Hand the item over to the iframe request; it is yielded once the description is merged in.
+      # High priority + a different download slot (ebaydesc.com) keeps this off the browser's critical path.
+      yield scrapy.Request(desc_iframe_url,
+                           callback=self.parse_description_iframe,
+                           errback=self.description_iframe_failed,
+                           meta={'item': item, 'allow_offsite': True},
+                           priority=self.config.get('description_iframe_priority', 100),
+                           dont_filter=True)
+      return
     print("Final A Fckd Item",item)
     yield item
 
+  def _extract_description_text(self, html_content):
+    soup_desc = BeautifulSoup(html_content, 'html.parser')
+    for s_tag in soup_desc(['script', 'style']): s_tag.decompose()
+    return soup_desc.get_text(separator=' ', strip=True)
+
+  def parse_seller_profile(self, response):
+    seller_id = response.meta['seller_id']
+    page_text = " ".join(t.strip() for t in response.css('body ::text').getall() if t.strip())
+    fields = {}
+    rating_match = re.search(r'(\d{1,3}(?:\.\d+)?)%\s*positive feedback', page_text, re.IGNORECASE)
+    if rating_match: fields['seller_rating'] = f"{rating_match.group(1)}% Positive feedback"
+    feedback_match = re.search(r'\((\d[\d,]*)\)', response.css('h1 ~ * ::text, div.str-seller-card__stats ::text').get() or "") or \
+                     re.search(r'feedback score[:\s]*(\d[\d,]*)', page_text, re.IGNORECASE)
+    if feedback_match: fields['seller_feedback_count'] = feedback_match.group(1)
+    if re.search(r'top rated seller', page_text, re.IGNORECASE): fields['top_rated_seller'] = True
+    self.seller_registry.update(seller_id, fields, enriched=True)
+    self.logger.info(f"Enriched seller '{seller_id}' from profile page: {sorted(fields)}")
+
+  def parse_description_iframe(self, response):
+    item = response.meta['item']
+    self._record_stage('description_fetch', response.meta.get('download_latency'))
+    description = self._extract_description_text(response.text)
+    if description:
+      item['description'] = description
+    else:
+      self.logger.warning(f"Description iframe {response.url} was empty for {item.get('link')}.")
+    yield item
+
+  def description_iframe_failed(self, failure):
+    # Keep the item (with the placeholder description) rather than losing it to a failed side request
+    item = failure.request.meta['item']
+    self.logger.warning(f"Failed to fetch description iframe {failure.request.url}: {failure.value!r}")
+    yield item
+
   @classmethod
   def from_crawler(cls, crawler, *args, **kwargs): # (Same as before)
     spider = super(MainSpider, cls).from_crawler(crawler, *args, **kwargs)
     crawler.signals.connect(spider.spider_closed, signal=scrapy.signals.spider_closed)
+    crawler.signals.connect(spider.spider_idle, signal=scrapy.signals.spider_idle)
     return spider
 
-  def spider_closed(self, spider, reason): # (Same as before)
-    if hasattr(self, 'driver') and self.driver:
+  def spider_idle(self, spider):
+    # Safety net: if an SRP was never counted as finished, held item pages are scheduled instead of lost
+    outputs = self._release_item_pages()
+    requests = [output for output in outputs if isinstance(output, scrapy.Request)]
+    cards = [output for output in outputs if not isinstance(output, scrapy.Request)]
+    if cards:
+      # A signal handler can't return items, so fast-mode cards of dropped pages ride on a local data: request
+      requests.append(scrapy.Request('data:,',
+                                     callback=self.emit_held_cards,
+                                     meta={'held_cards': cards, 'proxy': None, 'allow_offsite': True},
+                                     dont_filter=True))
+    for request in requests:
+      self.crawler.engine.crawl(request)
+    if requests:
+      raise DontCloseSpider
+
+  def emit_held_cards(self, response):
+    yield from response.meta['held_cards']
+
+  def spider_closed(self, spider, reason):
+    try:
+      self.autocomplete_cache.save()
+    except Exception as e:
+      self.logger.error(f"Error saving autocomplete cache: {e}")
+    try:
+      for drift in self.selector_stats.drift_report():
+        self.logger.warning(f"SELECTOR DRIFT: field '{drift['field']}' hit rate {drift['run_hit_rate']:.0%} this run vs "
+                            f"{drift['historical_hit_rate']:.0%} historically ({drift['samples']} pages). Best selector this run: {drift['best_selector_this_run']}")
+      self.selector_stats.save()
+    except Exception as e:
+      self.logger.error(f"Error saving selector stats: {e}")
+    scheduler = self.item_scheduler
+    self.logger.info(f"Item scheduler: {scheduler.scheduled} item pages scheduled ({scheduler.deferred} deferred), "
+                     f"{scheduler.renders_used} rendered, {scheduler.dropped} dropped"
+                     f"{f' (budget {scheduler.budget})' if scheduler.budget else ''}.")
+    if self.price_reference:
+      self.price_reference.close()
+    if self.circuit_pool:
+      self.logger.info(f"Proxy circuit health: {json.dumps(self.circuit_pool.summary())}")
+    try:
+      self.seen_items.save()
+      self.rendered_items.save()
+      self.query_planner.save()
+    except Exception as e:
+      self.logger.error(f"Error saving query planner state: {e}")
+    try:
+      self.seller_registry.save()
+      self.logger.info(f"Seller registry: {len(self.seller_registry.entries)} sellers, {self.seller_registry.hits} cache hits, {self.seller_registry.misses} misses.")
+    except Exception as e:
+      self.logger.error(f"Error saving seller registry: {e}")
+    if hasattr(self, 'session'):
       try:
-        self.driver.quit()
+        self.session.quit()
         self.logger.info('Selenium WebDriver quit successfully.')
       except Exception as e:
         self.logger.error(f"Error quitting WebDriver: {e}")
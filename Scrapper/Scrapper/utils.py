@@ -0,0 +1,70 @@
+import os
+import json
+import re
+import tempfile
+
+# Default directory (relative to scraper_config.json) for caches and run-to-run state
+DEFAULT_STATE_DIR = 'state'
+
+def resolve_state_path(config, config_path, filename):
+  """Returns the absolute path of a state file, creating the state directory if needed."""
+  state_dir = config.get('state_dir', DEFAULT_STATE_DIR)
+  if not os.path.isabs(state_dir):
+    state_dir = os.path.join(os.path.dirname(os.path.abspath(config_path)), state_dir)
+  os.makedirs(state_dir, exist_ok=True)
+  return os.path.join(state_dir, filename)
+
+def load_json_file(path, default=None):
+  try:
+    with open(path, 'r', encoding='utf-8') as f:
+      return json.load(f)
+  except (FileNotFoundError, json.JSONDecodeError, OSError):
+    return default
+
+def save_json_file(path, data):
+  # Write to a temp file first so an interrupted run never leaves a truncated cache behind
+  directory = os.path.dirname(os.path.abspath(path))
+  os.makedirs(directory, exist_ok=True)
+  fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.json')
+  try:
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+      json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+  except Exception:
+    if os.path.exists(tmp_path):
+      os.remove(tmp_path)
+    raise
+
+def extract_item_id(url):
+  """eBay item ID from an item URL (/itm/<id> or /itm/<slug>/<id>, or an item= query param)."""
+  if not url:
+    return None
+  match = re.search(r'/itm/(?:[^/?#]+/)?(\d{9,15})', url) or re.search(r'[?&]item=(\d{9,15})', url)
+  return match.group(1) if match else None
+
+def category_allowed(suggestion, allowed_category_keywords, allow_uncategorized=True):
+  """Whether an autocomplete suggestion's category name contains one of the allowed keywords.
+  Suggestions without a category pass only if allow_uncategorized is set."""
+  cat_name = suggestion.get('category_name')
+  if not (cat_name and suggestion.get('category_id')):
+    return allow_uncategorized
+  return not allowed_category_keywords or any(kw.lower() in cat_name.lower() for kw in allowed_category_keywords)
+
+CHALLENGE_KEYWORDS_TITLE = ["pardon our interruption", "access denied", "are you a human", "checking your browser", "Distil", "Incapsula", "Akamai"]
+CHALLENGE_KEYWORDS_URL = ["challenge", "captcha", "distil_", "incap_"]
+CHALLENGE_KEYWORDS_BODY = ["reference id:", "please verify you are human", "enable javascript and cookies", "completing the security check"]
+
+def is_bot_challenge(title, url, page_source):
+  """Checks if a page (browser-rendered or plain HTTP) is a bot challenge page."""
+  title = (title or "").lower()
+  url = (url or "").lower()
+  page_source = (page_source or "").lower()
+  if any(keyword in title for keyword in CHALLENGE_KEYWORDS_TITLE):
+    return True
+  if any(keyword in url for keyword in CHALLENGE_KEYWORDS_URL):
+    return True
+  if any(keyword in page_source for keyword in CHALLENGE_KEYWORDS_BODY):
+    # Be careful with body checks as legitimate pages might have "reference id" for other reasons
+    if "reference id:" in page_source and "checking your browser" in page_source: # More specific
+      return True
+  return False
@@ -0,0 +1 @@
+# Offline load-test harness: a mock marketplace server plus a runner for MainSpider.
@@ -0,0 +1,274 @@
+"""End-to-end throughput harness: runs MainSpider headless against the local mock marketplace.
+
+Run from the Scrapy project directory (the one containing scrapy.cfg):
+
+  python -m loadtest.harness --keywords "MacBook Pro" --latency-ms 100 --output run.json
+  python -m loadtest.harness --baseline run.json --config-override '{"srp_fast_mode": true}'
+  python -m loadtest.harness --proxy-standins 2 --proxy-standins-down 1
+
+Reports browser pages/min, items/min, per-stage latency (from the spider's
+stage/* crawl stats) and peak memory of the crawler plus its browser processes.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+
+from scrapy import signals
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+from loadtest.mock_marketplace import MockMarketplace
+from loadtest.proxy_standin import ProxyStandIns
+
+try:
+  import psutil # Optional: gives peak RSS including Firefox; otherwise only this process is measured
+except ImportError:
+  psutil = None
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CONFIG_PATH = os.path.join(PROJECT_DIR, 'Scrapper', 'scraper_config.json')
+
+# Every human-pacing delay in scraper_config.json is zeroed so the run measures the crawler, not the sleeps
+DELAY_KEYS = [
+  "selenium_general_delay_min", "selenium_general_delay_max",
+  "autocomplete_char_min_delay", "autocomplete_char_max_delay",
+  "autocomplete_post_type_delay_min", "autocomplete_post_type_delay_max",
+  "autocomplete_results_settle_delay_min", "autocomplete_results_settle_delay_max",
+  "selenium_srp_delay_min", "selenium_srp_delay_max",
+  "srp_selenium_post_load_delay_min", "srp_selenium_post_load_delay_max",
+  "selenium_item_page_delay_min", "selenium_item_page_delay_max",
+  "item_page_selenium_post_load_delay_min", "item_page_selenium_post_load_delay_max",
+  "tab_dispatch_delay_min", "tab_dispatch_delay_max",
+]
+
+
+class MemorySampler:
+  """Samples RSS of this process and all its children (geckodriver, Firefox) in a background thread."""
+
+  def __init__(self, interval=0.5):
+    self.interval = interval
+    self.peak_mb = 0.0
+    self._stop = threading.Event()
+    self._thread = threading.Thread(target=self._run, name='memory-sampler', daemon=True)
+
+  def _sample(self):
+    root = psutil.Process()
+    total = 0
+    for proc in [root] + root.children(recursive=True):
+      try:
+        total += proc.memory_info().rss
+      except (psutil.NoSuchProcess, psutil.AccessDenied):
+        pass
+    self.peak_mb = max(self.peak_mb, total / (1024 * 1024))
+
+  def _run(self):
+    while not self._stop.is_set():
+      self._sample()
+      self._stop.wait(self.interval)
+
+  def start(self):
+    if psutil is not None:
+      self._thread.start()
+    return self
+
+  def stop(self):
+    self._stop.set()
+    if psutil is not None:
+      self._thread.join()
+      self._sample()
+      return self.peak_mb
+    # Fallback: peak RSS of this process plus the largest reaped child (KB on Linux)
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own + children
+
+
+def build_config(base_config_path, base_url, keywords, state_dir, overrides, tabs_per_browser=None):
+  with open(base_config_path, 'r', encoding='utf-8') as f:
+    config = json.load(f)
+  config['base_keywords'] = keywords
+  config['headless'] = True
+  config['use_tor'] = False
+  config['state_dir'] = state_dir
+  for key in DELAY_KEYS:
+    config[key] = 0
+  site = config['sites']['ebay_us']
+  site['base_url'] = base_url
+  site['autocomplete_api_url_template'] = f"{base_url}/autocomplete?kwd={{keyword}}"
+  if tabs_per_browser:
+    site['tabs_per_browser'] = tabs_per_browser
+  site['search_url_template_with_category'] = f"{base_url}/sch/i.html?_from=R40&_nkw={{search_term}}&_sacat={{category_id}}&LH_TitleDesc=0&rt=1&_ipg=240"
+  site['search_url_template_no_category'] = f"{base_url}/sch/i.html?_from=R40&_nkw={{search_term}}&_sacat=0&LH_TitleDesc=0&rt=1&_ipg=240"
+  config.update(overrides)
+  return config
+
+
+def summarize(stats, pages, items, elapsed, peak_mb, market):
+  minutes = max(elapsed, 1e-9) / 60
+  stages = {}
+  for key, value in stats.items():
+    if key.startswith('stage/') and key.endswith('/count'):
+      stage = key[len('stage/'):-len('/count')]
+      total = stats.get(f'stage/{stage}/seconds', 0.0)
+      stages[stage] = {
+        'count': value,
+        'avg_ms': round(1000 * total / value, 1) if value else None,
+        'max_ms': round(1000 * stats.get(f'stage/{stage}/max_seconds', 0.0), 1),
+        'total_s': round(total, 2),
+      }
+  return {
+    'elapsed_s': round(elapsed, 2),
+    'browser_pages': pages,
+    'items': items,
+    'pages_per_min': round(pages / minutes, 1),
+    'items_per_min': round(items / minutes, 1),
+    'peak_memory_mb': round(peak_mb, 1),
+    'http_responses': stats.get('downloader/response_count', 0),
+    'browser_recycles': stats.get('harness/browser_recycles', 0),
+    'stages': dict(sorted(stages.items())),
+    'mock_requests': dict(sorted(market.request_counts.items())),
+  }
+
+
+def print_report(report, baseline=None):
+  def delta(key, current, higher_is_better=True):
+    if not baseline or baseline.get(key) in (None, 0):
+      return ""
+    change = 100.0 * (current - baseline[key]) / baseline[key]
+    better = change >= 0 if higher_is_better else change <= 0
+    return f"  ({change:+.1f}% vs baseline, {'better' if better else 'worse'})"
+
+  print("\n=== Load test report ===")
+  print(f"elapsed:        {report['elapsed_s']}s")
+  print(f"browser pages:  {report['browser_pages']}  ({report['pages_per_min']}/min){delta('pages_per_min', report['pages_per_min'])}")
+  print(f"items:          {report['items']}  ({report['items_per_min']}/min){delta('items_per_min', report['items_per_min'])}")
+  print(f"peak memory:    {report['peak_memory_mb']} MB{delta('peak_memory_mb', report['peak_memory_mb'], higher_is_better=False)}")
+  print(f"http responses: {report['http_responses']}, browser recycles: {report['browser_recycles']}")
+  print("stage latency:")
+  for stage, data in report['stages'].items():
+    base_avg = ((baseline or {}).get('stages', {}).get(stage) or {}).get('avg_ms')
+    compare = f"  (baseline {base_avg} ms)" if base_avg is not None else ""
+    print(f"  {stage:<18} n={data['count']:<5} avg={data['avg_ms']} ms  max={data['max_ms']} ms{compare}")
+  print(f"mock requests:  {report['mock_requests']}")
+  if report.get('proxy_standins'):
+    print(f"proxy circuits: {report['proxy_standins']}")
+
+
+def run(args):
+  market = MockMarketplace(port=args.port, latency_ms=args.latency_ms, latency_jitter_ms=args.latency_jitter_ms,
+                           error_rate=args.error_rate, bot_challenge_rate=args.bot_challenge_rate,
+                           catalog_size=args.catalog_size).start()
+  standins = None
+  if args.proxy_standins or args.proxy_standins_down:
+    standins = ProxyStandIns(args.proxy_standins, down=args.proxy_standins_down).start()
+  state_dir = args.state_dir or tempfile.mkdtemp(prefix='loadtest_state_')
+  work_dir = tempfile.mkdtemp(prefix='loadtest_')
+  try:
+    config = build_config(args.config, market.base_url, args.keywords, state_dir, json.loads(args.config_override), args.tabs_per_browser)
+    if standins:
+      config['proxy_circuits'] = standins.config()
+    config_path = os.path.join(work_dir, 'scraper_config.json')
+    with open(config_path, 'w', encoding='utf-8') as f:
+      json.dump(config, f, indent=2)
+
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'Scrapper.settings')
+    settings = get_project_settings()
+    # cmdline priority beats MainSpider.custom_settings, which would otherwise re-add the polite delays
+    settings.setdict({
+      'LOG_LEVEL': args.log_level,
+      'DOWNLOAD_DELAY': 0,
+      'AUTOTHROTTLE_ENABLED': False,
+      'CONCURRENT_REQUESTS': args.concurrent_requests,
+      'CONCURRENT_REQUESTS_PER_DOMAIN': args.concurrent_requests,
+      'CONCURRENT_REQUESTS_PER_IP': 0,
+      'ITEM_PIPELINES': {} if not args.with_pipelines else settings.getdict('ITEM_PIPELINES'),
+      'IMAGES_STORE': os.path.join(work_dir, 'images'),
+      'CLOSESPIDER_ITEMCOUNT': args.max_items,
+      'CLOSESPIDER_TIMEOUT': args.timeout,
+      'TELNETCONSOLE_ENABLED': False,
+    }, priority='cmdline')
+
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler('main')
+    counters = {'items': 0}
+
+    def on_item(item, response, spider):
+      counters['items'] += 1
+
+    def on_closed(spider, reason):
+      crawler.stats.set_value('harness/browser_pages', spider.session.total_pages_served)
+      crawler.stats.set_value('harness/browser_recycles', spider.session.recycle_count)
+      crawler.stats.set_value('harness/close_reason', reason)
+
+    crawler.signals.connect(on_item, signal=signals.item_scraped)
+    crawler.signals.connect(on_closed, signal=signals.spider_closed)
+
+    sampler = MemorySampler().start()
+    started = time.time()
+    process.crawl(crawler, config_path=config_path)
+    process.start()
+    elapsed = time.time() - started
+    peak_mb = sampler.stop()
+
+    stats = crawler.stats.get_stats()
+    report = summarize(stats, stats.get('harness/browser_pages', 0), counters['items'], elapsed, peak_mb, market)
+    report['close_reason'] = stats.get('harness/close_reason')
+    if standins:
+      report['proxy_standins'] = standins.summary()
+    report['params'] = {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}
+    return report
+  finally:
+    market.stop()
+    if standins:
+      standins.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    if not args.state_dir:
+      shutil.rmtree(state_dir, ignore_errors=True)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Measure MainSpider throughput against a local mock marketplace.")
+  parser.add_argument('--keywords', nargs='+', default=["MacBook Pro"])
+  parser.add_argument('--config', default=DEFAULT_CONFIG_PATH, help="scraper_config.json to start from")
+  parser.add_argument('--config-override', default='{}', help="JSON object merged into the config, e.g. '{\"srp_fast_mode\": true}'")
+  parser.add_argument('--state-dir', default=None, help="Reuse a state dir (warm caches) instead of a fresh temporary one")
+  parser.add_argument('--port', type=int, default=0)
+  parser.add_argument('--latency-ms', type=float, default=50)
+  parser.add_argument('--latency-jitter-ms', type=float, default=50)
+  parser.add_argument('--error-rate', type=float, default=0.0)
+  parser.add_argument('--bot-challenge-rate', type=float, default=0.0)
+  parser.add_argument('--catalog-size', type=int, default=5000)
+  parser.add_argument('--concurrent-requests', type=int, default=8)
+  parser.add_argument('--tabs-per-browser', type=int, default=None, help="Override the site's tabs_per_browser")
+  parser.add_argument('--proxy-standins', type=int, default=0, help="Route the crawl through this many local proxy circuit stand-ins")
+  parser.add_argument('--proxy-standins-down', type=int, default=0, help="Extra stand-in circuits that refuse connections (exercise probing)")
+  parser.add_argument('--max-items', type=int, default=200, help="Stop after this many items (0 = no limit)")
+  parser.add_argument('--timeout', type=int, default=600, help="Stop after this many seconds (0 = no limit)")
+  parser.add_argument('--with-pipelines', action='store_true', help="Keep the project's item pipelines enabled")
+  parser.add_argument('--log-level', default='WARNING')
+  parser.add_argument('--output', help="Write the JSON report here")
+  parser.add_argument('--baseline', help="Previous JSON report to compare against")
+  args = parser.parse_args(argv)
+
+  baseline = None
+  if args.baseline:
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+      baseline = json.load(f)
+
+  report = run(args)
+  print_report(report, baseline)
+  if args.output:
+    with open(args.output, 'w', encoding='utf-8') as f:
+      json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,308 @@
+"""Local stand-in for the marketplace, serving pages shaped like the ones MainSpider's selectors expect.
+
+Routes:
+  /                      homepage with the search bar and a JS-driven autocomplete list
+  /autocomplete?kwd=     suggestion JSON used by the homepage
+  /sch/i.html            paginated search results (_nkw, _sacat, _pgn, _ipg)
+  /itm/<slug>/<id>       item page (description inline or in an iframe)
+  /desc/<id>             description iframe source
+  /usr/<seller>          seller profile
+  /img/<name>            placeholder image
+
+Latency, HTTP errors and bot challenges can be injected per request.
+
+  python -m loadtest.mock_marketplace --port 8765 --latency-ms 150 --error-rate 0.02
+"""
+import re
+import json
+import time
+import random
+import argparse
+import threading
+import html as html_lib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, quote_plus
+
+MODELS = ["pro", "air"]
+SIZES = ["13", "14", "15", "16"]
+YEARS = [str(y) for y in range(2015, 2024)]
+CHIPS = ["intel", "m1", "m2", "m3"]
+RAM = ["8gb", "16gb", "32gb"]
+CONDITIONS = ["Used", "Open box", "For parts or not working", "Certified - Refurbished"]
+SELLERS = [f"seller_{n:03d}" for n in range(300)]
+SUGGESTION_SUFFIXES = ["", " 2019", " 2019 16", " m1", " 13", " 15 inch", " charger"]
+LAPTOP_CATEGORY = ("111422", "Apple Laptops")
+CHARGER_CATEGORY = ("31510", "Laptop Power Adapters/Chargers")
+
+# 1x1 transparent GIF
+PLACEHOLDER_IMAGE = bytes.fromhex("47494638396101000100800000000000ffffff21f90401000000002c00000000010001000002024401003b")
+
+BOT_CHALLENGE_PAGE = """<html><head><title>Pardon Our Interruption</title></head>
+<body><h1>Pardon Our Interruption...</h1><p>Please verify you are human.</p></body></html>"""
+
+
+def tokenize(text):
+  return set(re.findall(r"[a-z0-9]+", (text or "").lower()))
+
+
+class Catalog:
+  """Deterministic set of listings; a search matches every listing whose title contains all query words."""
+
+  def __init__(self, size=5000, seed=7):
+    rng = random.Random(seed)
+    self.items = []
+    for n in range(size):
+      model, size_in, year = rng.choice(MODELS), rng.choice(SIZES), rng.choice(YEARS)
+      chip, ram = rng.choice(CHIPS), rng.choice(RAM)
+      title = f"Apple MacBook {model.title()} {size_in} {year} {chip.upper()} {ram.upper()} Laptop"
+      self.items.append({
+        'id': str(100000000000 + n * 7919),
+        'title': title,
+        'tokens': tokenize(title),
+        'price': round(rng.uniform(150, 2800), 2),
+        'condition': rng.choice(CONDITIONS),
+        'seller': rng.choice(SELLERS),
+        'iframe_description': n % 2 == 0,
+        'images': rng.randint(1, 6),
+      })
+    self.by_id = {item['id']: item for item in self.items}
+
+  def search(self, keyword):
+    words = tokenize(keyword)
+    return [item for item in self.items if words <= item['tokens']]
+
+
+class MockMarketplaceHandler(BaseHTTPRequestHandler):
+  server_version = "MockMarketplace/1.0"
+
+  def log_message(self, format, *args): # Keep the harness output readable
+    pass
+
+  def _send(self, body, status=200, content_type="text/html; charset=utf-8"):
+    if isinstance(body, str):
+      body = body.encode("utf-8")
+    self.send_response(status)
+    self.send_header("Content-Type", content_type)
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def do_GET(self):
+    market = self.server.market
+    parsed = urlparse(self.path)
+    query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+    market.record_request(parsed.path)
+
+    if parsed.path.startswith("/img/"):
+      return self._send(PLACEHOLDER_IMAGE, content_type="image/gif")
+
+    market.inject_latency()
+    if market.should_fail():
+      return self._send("<html><body>Internal error</body></html>", status=500)
+    if parsed.path != "/autocomplete" and market.should_challenge():
+      return self._send(BOT_CHALLENGE_PAGE)
+
+    if parsed.path in ("", "/"):
+      return self._send(market.render_home())
+    if parsed.path == "/autocomplete":
+      return self._send(json.dumps(market.suggestions(query.get("kwd", ""))), content_type="application/json")
+    if parsed.path == "/sch/i.html":
+      return self._send(market.render_srp(query))
+    match = re.match(r"^/itm/(?:[^/]+/)?(\d+)$", parsed.path)
+    if match and match.group(1) in market.catalog.by_id:
+      return self._send(market.render_item(market.catalog.by_id[match.group(1)]))
+    match = re.match(r"^/desc/(\d+)$", parsed.path)
+    if match and match.group(1) in market.catalog.by_id:
+      return self._send(market.render_description(market.catalog.by_id[match.group(1)]))
+    match = re.match(r"^/usr/([^/]+)$", parsed.path)
+    if match:
+      return self._send(market.render_seller(match.group(1)))
+    return self._send("<html><body>Not found</body></html>", status=404)
+
+
+class MockMarketplace:
+  """Owns the catalog, the fault-injection knobs and the server thread."""
+
+  def __init__(self, host="127.0.0.1", port=0, latency_ms=0, latency_jitter_ms=0, error_rate=0.0,
+               bot_challenge_rate=0.0, catalog_size=5000, seed=7):
+    self.catalog = Catalog(catalog_size, seed)
+    self.latency_ms = latency_ms
+    self.latency_jitter_ms = latency_jitter_ms
+    self.error_rate = error_rate
+    self.bot_challenge_rate = bot_challenge_rate
+    self.rng = random.Random(seed)
+    self.rng_lock = threading.Lock()
+    self.request_counts = {}
+    self.httpd = ThreadingHTTPServer((host, port), MockMarketplaceHandler)
+    self.httpd.daemon_threads = True
+    self.httpd.market = self
+    self.thread = None
+
+  @property
+  def base_url(self):
+    host, port = self.httpd.server_address[:2]
+    return f"http://{host}:{port}"
+
+  def start(self):
+    self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-marketplace", daemon=True)
+    self.thread.start()
+    return self
+
+  def stop(self):
+    self.httpd.shutdown()
+    self.httpd.server_close()
+
+  # --- fault injection ---
+  def _roll(self):
+    with self.rng_lock:
+      return self.rng.random()
+
+  def inject_latency(self):
+    if self.latency_ms or self.latency_jitter_ms:
+      jitter = self._roll() * self.latency_jitter_ms
+      time.sleep((self.latency_ms + jitter) / 1000.0)
+
+  def should_fail(self):
+    return self.error_rate > 0 and self._roll() < self.error_rate
+
+  def should_challenge(self):
+    return self.bot_challenge_rate > 0 and self._roll() < self.bot_challenge_rate
+
+  def record_request(self, path):
+    route = "/" + path.strip("/").split("/")[0] if path.strip("/") else "/"
+    with self.rng_lock:
+      self.request_counts[route] = self.request_counts.get(route, 0) + 1
+
+  # --- pages ---
+  def suggestions(self, keyword):
+    keyword = " ".join(keyword.split())
+    sug, categories = [], []
+    for suffix in SUGGESTION_SUFFIXES:
+      term = f"{keyword}{suffix}".strip().lower()
+      cat_id, cat_name = CHARGER_CATEGORY if "charger" in suffix else LAPTOP_CATEGORY
+      sug.append(term)
+      categories.append({"term": term, "id": cat_id, "name": cat_name})
+    return {"prefix": keyword, "res": {"sug": sug, "categories": categories}}
+
+  def render_home(self):
+    return """<!DOCTYPE html><html><head><title>Mock Marketplace</title></head><body>
+<form action="/sch/i.html"><input id="gh-ac" name="_nkw" type="text" autocomplete="off"></form>
+<ul id="ebay-autocomplete" style="display:none" role="listbox"></ul>
+<script>
+var box = document.getElementById('gh-ac'), list = document.getElementById('ebay-autocomplete'), timer = null;
+box.addEventListener('input', function () {
+  clearTimeout(timer);
+  timer = setTimeout(function () {
+    if (!box.value) { list.style.display = 'none'; return; }
+    fetch('/autocomplete?kwd=' + encodeURIComponent(box.value)).then(function (r) { return r.json(); }).then(function (data) {
+      list.innerHTML = '';
+      data.res.categories.forEach(function (c) {
+        var li = document.createElement('li');
+        li.setAttribute('role', 'option');
+        li.setAttribute('data-value', c.term);
+        li.setAttribute('data-cat-id', c.id);
+        li.innerHTML = '<span class="ebayui-ellipsis-3"></span><div class="ebay-autocomplete-cat"></div>';
+        li.firstChild.textContent = c.term;
+        li.lastChild.textContent = 'in ' + c.name;
+        list.appendChild(li);
+      });
+      list.style.display = 'block';
+    });
+  }, 150);
+});
+</script></body></html>"""
+
+  def render_srp(self, query):
+    keyword = query.get("_nkw", "")
+    page = max(1, int(query.get("_pgn", "1") or 1))
+    per_page = max(1, int(query.get("_ipg", "240") or 240))
+    results = self.catalog.search(keyword)
+    total_pages = max(1, (len(results) + per_page - 1) // per_page)
+    cards = []
+    for item in results[(page - 1) * per_page: page * per_page]:
+      slug = quote_plus(item['title'].replace(" ", "-"))
+      cards.append(f"""<li class="s-item">
+  <div class="s-item__image-wrapper"><img src="/img/{item['id']}-thumb.jpg"></div>
+  <a class="s-item__link" href="/itm/{slug}/{item['id']}?hash=item{item['id']}">
+    <div class="s-item__title"><span role="heading">{html_lib.escape(item['title'])}</span></div></a>
+  <div class="s-item__subtitle"><span class="SECONDARY_INFO">{item['condition']}</span></div>
+  <span class="s-item__price">${item['price']:,.2f}</span>
+  <span class="s-item__shipping s-item__logisticsCost">{'Free shipping' if item['price'] > 500 else '+$19.99 shipping'}</span>
+  <span class="s-item__location s-item__itemLocation">from United States</span>
+  <span class="s-item__seller-info-text">{item['seller']} ({(int(item['id']) % 9000) + 12:,}) 99.{int(item['id']) % 10}%</span>
+</li>""")
+    next_link = ""
+    if page < total_pages:
+      next_link = f'<a class="pagination__next" href="/sch/i.html?_nkw={quote_plus(keyword)}&_sacat={query.get("_sacat", "0")}&_ipg={per_page}&_pgn={page + 1}">Next</a>'
+    if not cards:
+      body = '<h3 class="srp-save-null-search__heading">No exact matches found</h3>'
+    else:
+      body = f'<ul class="srp-results srp-list">{"".join(cards)}</ul>'
+    return f"""<!DOCTYPE html><html><head><title>{html_lib.escape(keyword)} | Mock Marketplace</title></head><body>
+<div class="srp-river-results">{body}</div>
+<nav role="navigation"><ul class="pagination__items"></ul>{next_link}</nav>
+</body></html>"""
+
+  def render_item(self, item):
+    images = "".join(
+      f'<div class="ux-image-carousel-item"><img data-zoom-src="/img/{item["id"]}-{n}.jpg" src="/img/{item["id"]}-{n}-s.jpg"></div>'
+      for n in range(item['images']))
+    if item['iframe_description']:
+      description = f'<iframe id="desc_ifr" src="/desc/{item["id"]}"></iframe>'
+    else:
+      description = f'<div id="desc_div"><p>{html_lib.escape(item["title"])} in {item["condition"].lower()} condition.</p><script>var x=1;</script></div>'
+    specifics = "".join(
+      f'<div class="ux-labels-values__specifications--row"><div class="ux-labels-values__labels-content"><span class="ux-textspans ux-textspans--BOLD">{label}</span></div>'
+      f'<div class="ux-labels-values__values-content"><span class="ux-textspans">{value}</span></div></div>'
+      for label, value in (("Brand", "Apple"), ("Item location", "Austin, Texas, United States"), ("Processor", item['title'].split()[5]), ("Screen Size", item['title'].split()[3])))
+    top_rated = '<span class="ux-icon--TOP_RATED_PLUS_SEAL"></span>' if int(item['id']) % 3 == 0 else ''
+    return f"""<!DOCTYPE html><html><head><title>{html_lib.escape(item['title'])} | Mock Marketplace</title></head><body>
+<nav aria-label="breadcrumb"><ol><li><a><span>Home</span></a></li><li><a><span>Computers/Tablets &amp; Networking</span></a></li><li><a><span>Laptops &amp; Netbooks</span></a></li><li><a><span>Apple Laptops</span></a></li></ol></nav>
+<h1 class="x-item-title__mainTitle"><span class="ux-textspans ux-textspans--BOLD">{html_lib.escape(item['title'])}</span></h1>
+<div class="x-price-primary"><span class="ux-textspans">US ${item['price']:,.2f}</span></div>
+<div data-testid="x-item-condition"><div class="ux-labels-values__values-content"><span class="ux-textspans">{item['condition']}</span></div></div>
+{images}
+<div class="x-sellercard-atf__info__about-seller"><a class="ux-action" aria-label="{item['seller']} feedback score" href="/usr/{item['seller']}"><span class="ux-textspans">{item['seller']}</span><span aria-hidden="true">({(int(item['id']) % 9000) + 12})</span></a></div>
+<div class="x-sellercard-atf__info__rating"><span class="ux-textspans ux-textspans--PERCENTAGE">99.{int(item['id']) % 10}% positive</span></div>
+{top_rated}
+<div data-testid="x-returns-section"><span class="ux-textspans">Free returns</span></div>
+<div class="ux-layout-section-evo">{specifics}</div>
+<div id="desc_module">{description}</div>
+</body></html>"""
+
+  def render_description(self, item):
+    return f"""<html><head><style>p {{ color: #333; }}</style><script>console.log('desc');</script></head>
+<body><p>{html_lib.escape(item['title'])}. Condition: {item['condition']}. Battery cycles: {int(item['id']) % 900}. Ships in original box.</p></body></html>"""
+
+  def render_seller(self, seller):
+    seed = sum(ord(c) for c in seller)
+    return f"""<html><head><title>{html_lib.escape(seller)} on Mock Marketplace</title></head><body>
+<h1>{html_lib.escape(seller)}</h1><div class="str-seller-card__stats"><span>({1000 + seed * 7})</span></div>
+<p>99.{seed % 10}% positive feedback</p>{'<p>Top Rated Seller</p>' if seed % 2 else ''}
+</body></html>"""
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Serve a local mock marketplace for MainSpider load tests.")
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8765)
+  parser.add_argument("--latency-ms", type=float, default=0)
+  parser.add_argument("--latency-jitter-ms", type=float, default=0)
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  parser.add_argument("--bot-challenge-rate", type=float, default=0.0)
+  parser.add_argument("--catalog-size", type=int, default=5000)
+  args = parser.parse_args()
+
+  market = MockMarketplace(args.host, args.port, args.latency_ms, args.latency_jitter_ms, args.error_rate,
+                           args.bot_challenge_rate, args.catalog_size)
+  print(f"Mock marketplace listening on {market.base_url} (Ctrl+C to stop)")
+  try:
+    market.httpd.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    market.httpd.server_close()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,363 @@
+"""Local stand-ins for Tor circuits, so the proxy circuit pool can be exercised offline.
+
+Each stand-in circuit listens on three local ports:
+  socks        minimal SOCKS5 proxy (no auth, CONNECT; IPv4/IPv6/domain targets), used by Firefox
+  http_tunnel  HTTP proxy (CONNECT tunnels plus absolute-form http:// requests), used by Scrapy
+  control      fake Tor control port answering AUTHENTICATE / SIGNAL NEWNYM / QUIT
+
+A circuit can be started "down" (nothing listens on its ports) or without a
+control port, to exercise probe() cooldowns and rotation by cooldown instead of NEWNYM.
+
+  python -m loadtest.proxy_standin --circuits 2              # serve, print a proxy_circuits snippet
+  python -m loadtest.proxy_standin --self-check              # exercise CircuitPool and CircuitProxyMiddleware
+  python -m loadtest.harness --proxy-standins 2              # full crawl through the stand-ins
+"""
+import sys
+import json
+import socket
+import select
+import logging
+import argparse
+import threading
+import socketserver
+import urllib.request
+from urllib.parse import urlsplit
+
+
+def _relay(a, b, idle_timeout=60):
+  """Copies bytes both ways until either side closes (or nothing moves for idle_timeout seconds)."""
+  sockets = [a, b]
+  while True:
+    readable, _, errored = select.select(sockets, [], sockets, idle_timeout)
+    if errored or not readable:
+      return
+    for sock in readable:
+      try:
+        data = sock.recv(65536)
+      except OSError:
+        return
+      if not data:
+        return
+      (b if sock is a else a).sendall(data)
+
+
+def _free_port(host):
+  """A port nothing listens on (for circuits started down)."""
+  with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+    sock.bind((host, 0))
+    return sock.getsockname()[1]
+
+
+class _Server(socketserver.ThreadingTCPServer):
+  daemon_threads = True
+  allow_reuse_address = True
+
+  def __init__(self, address, handler, circuit):
+    self.circuit = circuit
+    super().__init__(address, handler)
+
+
+class Socks5Handler(socketserver.BaseRequestHandler):
+  def _read(self, count):
+    data = b""
+    while len(data) < count:
+      chunk = self.request.recv(count - len(data))
+      if not chunk:
+        raise ConnectionError("client closed during SOCKS handshake")
+      data += chunk
+    return data
+
+  def handle(self):
+    circuit = self.server.circuit
+    try:
+      version, method_count = self._read(2)
+      self._read(method_count)
+      if version != 5:
+        return
+      self.request.sendall(b"\x05\x00") # No authentication
+      _, command, _, address_type = self._read(4)
+      if address_type == 1:
+        host = socket.inet_ntoa(self._read(4))
+      elif address_type == 3:
+        host = self._read(self._read(1)[0]).decode()
+      elif address_type == 4:
+        host = socket.inet_ntop(socket.AF_INET6, self._read(16))
+      else:
+        self.request.sendall(b"\x05\x08\x00\x01\x00\x00\x00\x00\x00\x00") # Address type not supported
+        return
+      port = int.from_bytes(self._read(2), 'big')
+      if command != 1:
+        self.request.sendall(b"\x05\x07\x00\x01\x00\x00\x00\x00\x00\x00") # Only CONNECT
+        return
+      try:
+        upstream = socket.create_connection((host, port), timeout=10)
+      except OSError:
+        self.request.sendall(b"\x05\x05\x00\x01\x00\x00\x00\x00\x00\x00") # Connection refused
+        return
+      circuit.count('socks_connections')
+      with upstream:
+        self.request.sendall(b"\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00")
+        _relay(self.request, upstream)
+    except (OSError, ConnectionError, IndexError):
+      return
+
+
+class HttpTunnelHandler(socketserver.StreamRequestHandler):
+  def handle(self):
+    circuit = self.server.circuit
+    try:
+      request_line = self.rfile.readline(65536).decode('latin-1')
+      headers = []
+      while True:
+        line = self.rfile.readline(65536)
+        if line in (b"\r\n", b"\n", b""):
+          break
+        headers.append(line)
+      parts = request_line.split()
+      if len(parts) != 3:
+        return
+      method, target, version = parts
+      if method.upper() == 'CONNECT':
+        host, _, port = target.rpartition(':')
+        try:
+          upstream = socket.create_connection((host.strip('[]'), int(port)), timeout=10)
+        except (OSError, ValueError):
+          self.wfile.write(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+          return
+        circuit.count('tunnel_connections')
+        with upstream:
+          self.wfile.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+          self.wfile.flush()
+          _relay(self.request, upstream)
+        return
+      # Absolute-form request (plain http:// through a proxy): forward it in origin-form
+      url = urlsplit(target)
+      if url.scheme != 'http' or not url.hostname:
+        self.wfile.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        return
+      try:
+        upstream = socket.create_connection((url.hostname, url.port or 80), timeout=10)
+      except OSError:
+        self.wfile.write(b"HTTP/1.1 502 Bad Gateway\r\n\r\n")
+        return
+      circuit.count('tunnel_connections')
+      with upstream:
+        path = url.path or '/'
+        if url.query:
+          path += '?' + url.query
+        kept = [h for h in headers if not h.lower().startswith((b'proxy-connection:', b'connection:'))]
+        upstream.sendall(f"{method} {path} {version}\r\n".encode('latin-1') + b"".join(kept) + b"Connection: close\r\n\r\n")
+        length = next((int(h.split(b':', 1)[1]) for h in headers if h.lower().startswith(b'content-length:')), 0)
+        if length:
+          upstream.sendall(self.rfile.read(length))
+        _relay(self.request, upstream)
+    except (OSError, ValueError):
+      return
+
+
+class ControlPortHandler(socketserver.StreamRequestHandler):
+  def handle(self):
+    circuit = self.server.circuit
+    try:
+      for raw in self.rfile:
+        line = raw.decode('latin-1').strip()
+        command = line.split(' ', 1)[0].upper()
+        if command == 'AUTHENTICATE':
+          self.wfile.write(b"250 OK\r\n")
+        elif command == 'SIGNAL' and line.upper().endswith('NEWNYM'):
+          if circuit.reject_newnym:
+            self.wfile.write(b"552 Unrecognized signal\r\n")
+          else:
+            circuit.count('newnym')
+            self.wfile.write(b"250 OK\r\n")
+        elif command == 'QUIT':
+          self.wfile.write(b"250 closing connection\r\n")
+          return
+        else:
+          self.wfile.write(b"510 Unrecognized command\r\n")
+    except OSError:
+      return
+
+
+class StandInCircuit:
+  """One fake Tor instance: SOCKS port, HTTP tunnel port and (optionally) a control port."""
+
+  def __init__(self, name, host="127.0.0.1", control=True, http_tunnel=True, down=False, reject_newnym=False):
+    self.name = name
+    self.host = host
+    self.down = down
+    self.reject_newnym = reject_newnym
+    self.counters = {'socks_connections': 0, 'tunnel_connections': 0, 'newnym': 0}
+    self._lock = threading.Lock()
+    self._servers = []
+    self.ports = {}
+    if down:
+      self.ports['socks'] = _free_port(host)
+      return
+    for role, handler, enabled in (('socks', Socks5Handler, True), ('http_tunnel', HttpTunnelHandler, http_tunnel),
+                                   ('control', ControlPortHandler, control)):
+      if enabled:
+        server = _Server((host, 0), handler, self)
+        self._servers.append(server)
+        self.ports[role] = server.server_address[1]
+
+  def count(self, key):
+    with self._lock:
+      self.counters[key] += 1
+
+  def start(self):
+    for server in self._servers:
+      threading.Thread(target=server.serve_forever, name=f"standin-{self.name}", daemon=True).start()
+    return self
+
+  def stop(self):
+    for server in self._servers:
+      server.shutdown()
+      server.server_close()
+
+  def config_entry(self):
+    """This circuit as a scraper_config.json 'proxy_circuits' entry."""
+    entry = {'name': self.name}
+    for role, port in self.ports.items():
+      entry[role] = f"{self.host}:{port}"
+    return entry
+
+
+class ProxyStandIns:
+  """A set of stand-in circuits started and stopped together."""
+
+  def __init__(self, count=2, host="127.0.0.1", control=True, down=0):
+    self.circuits = [StandInCircuit(f"standin{idx}", host, control=control) for idx in range(count)]
+    self.circuits += [StandInCircuit(f"standin_down{idx}", host, down=True) for idx in range(down)]
+
+  def start(self):
+    for circuit in self.circuits:
+      circuit.start()
+    return self
+
+  def stop(self):
+    for circuit in self.circuits:
+      circuit.stop()
+
+  def config(self):
+    return [circuit.config_entry() for circuit in self.circuits]
+
+  def summary(self):
+    return {circuit.name: dict(circuit.counters) for circuit in self.circuits}
+
+
+def self_check():
+  """Exercises CircuitPool (probe/acquire/rotate), real traffic through both proxy ports and
+  CircuitProxyMiddleware against stand-ins. Returns the number of failed checks."""
+  from Scrapper.proxies import CircuitPool
+  from loadtest.mock_marketplace import MockMarketplace
+
+  logging.basicConfig(level=logging.WARNING)
+  logger = logging.getLogger('proxy_standin')
+  failures = []
+
+  def check(label, ok):
+    print(f"{'PASS' if ok else 'FAIL'}  {label}")
+    if not ok:
+      failures.append(label)
+
+  market = MockMarketplace().start()
+  with_control = StandInCircuit('with_control').start()
+  no_control = StandInCircuit('no_control', control=False).start()
+  down = StandInCircuit('down', down=True)
+  try:
+    pool = CircuitPool.from_config({'proxy_circuits': [c.config_entry() for c in (with_control, no_control, down)],
+                                    'circuit_cooldown_seconds': 60, 'circuit_newnym_min_interval_seconds': 0}, logger)
+    probe = pool.probe(timeout=1)
+    check("probe: reachable circuits are up", probe['with_control'] and probe['no_control'])
+    check("probe: unreachable circuit is put on cooldown", not probe['down'] and pool.get('down').is_cooling())
+
+    acquired = [pool.acquire() for _ in range(4)]
+    check("acquire: never hands out a cooling circuit", all(c.name != 'down' for c in acquired))
+    check("acquire: spreads load over healthy circuits", {c.name for c in acquired} == {'with_control', 'no_control'})
+    for circuit in acquired:
+      pool.release(circuit)
+
+    check("rotate: control port -> NEWNYM in place", pool.rotate(pool.get('with_control')) and with_control.counters['newnym'] == 1)
+    check("rotate: no control port -> cooldown", not pool.rotate(pool.get('no_control')) and pool.get('no_control').is_cooling())
+    check("acquire: only the NEWNYM'd circuit is left", pool.acquire().name == 'with_control')
+    pool.release(pool.get('with_control'))
+
+    # Real traffic through the HTTP tunnel (absolute-form) and the SOCKS port
+    proxy = pool.get('with_control').proxy_url
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({'http': proxy}))
+    with opener.open(f"{market.base_url}/", timeout=5) as response:
+      check("http_tunnel: fetches the mock marketplace", response.status == 200 and with_control.counters['tunnel_connections'] == 1)
+    host, port = market.httpd.server_address[:2]
+    with socket.create_connection(pool.get('with_control').socks, timeout=5) as sock:
+      sock.sendall(b"\x05\x01\x00")
+      sock.recv(2)
+      sock.sendall(b"\x05\x01\x00\x03" + bytes([len(host)]) + host.encode() + port.to_bytes(2, 'big'))
+      reply = sock.recv(10)
+      sock.sendall(f"GET / HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: close\r\n\r\n".encode())
+      body = b""
+      while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+          break
+        body += chunk
+    check("socks: CONNECT to the mock marketplace", reply[:2] == b"\x05\x00" and body.startswith(b"HTTP/1.") and b"200" in body.split(b"\r\n", 1)[0])
+
+    try:
+      from scrapy import Request
+      from scrapy.http import HtmlResponse
+      from Scrapper.middlewares import CircuitProxyMiddleware
+    except ImportError:
+      print("SKIP  CircuitProxyMiddleware (scrapy is not installed)")
+    else:
+      class _Spider:
+        circuit_pool = pool
+      _Spider.logger = logger
+      middleware = CircuitProxyMiddleware(max_retries=1)
+      request = Request(f"{market.base_url}/itm/1")
+      middleware.process_request(request, _Spider)
+      check("middleware: request bound to a tunnelled circuit", request.meta.get('proxy') == proxy and request.meta.get('circuit') == 'with_control')
+      newnym_before = with_control.counters['newnym']
+      challenged = HtmlResponse(request.url, status=200, request=request, encoding='utf-8',
+                                body=b"<html><head><title>Pardon Our Interruption</title></head><body>verify you are a human</body></html>")
+      retry = middleware.process_response(request, challenged, _Spider)
+      check("middleware: challenge rotates the circuit and retries", isinstance(retry, Request) and retry.meta.get('circuit_retries') == 1
+            and 'proxy' not in retry.meta and with_control.counters['newnym'] == newnym_before + 1)
+      middleware.process_request(retry, _Spider)
+      final = middleware.process_response(retry, challenged.replace(request=retry), _Spider)
+      check("middleware: gives up after CIRCUIT_CHALLENGE_RETRIES", final is not None and not isinstance(final, Request))
+  finally:
+    for circuit in (with_control, no_control, down):
+      circuit.stop()
+    market.stop()
+  print(f"{len(failures)} failed check(s).")
+  return len(failures)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Serve local stand-ins for Tor circuits (SOCKS, HTTP tunnel, control port).")
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--circuits', type=int, default=2)
+  parser.add_argument('--down', type=int, default=0, help="Extra circuits with nothing listening (probe failures)")
+  parser.add_argument('--no-control', action='store_true', help="No control ports: rotation falls back to cooldown")
+  parser.add_argument('--self-check', action='store_true', help="Run the CircuitPool/middleware checks and exit")
+  args = parser.parse_args(argv)
+
+  if args.self_check:
+    return 1 if self_check() else 0
+
+  standins = ProxyStandIns(args.circuits, args.host, control=not args.no_control, down=args.down).start()
+  print(json.dumps({'proxy_circuits': standins.config()}, indent=2))
+  print("Stand-in circuits running (Ctrl+C to stop).", file=sys.stderr)
+  try:
+    threading.Event().wait()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    standins.stop()
+    print(json.dumps(standins.summary(), indent=2), file=sys.stderr)
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())